@@ -1,10 +1,18 @@
 import streamlit as st
-from langchain_community.document_loaders import TextLoader, PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from chunkify import Timings, chunk_file
+from token_split import SplitConfig, load_token_counter
+from dedup import NearDuplicateFilter
+from exports import FORMATS, ChunkSpool, available_formats, export_file, prune_spools
 import tempfile
+import shutil
+import json
 import os
-import pandas as pd
-import time
+
+# Spools and exports of every session go under one directory, pruned whenever a new run starts:
+# Streamlit does not say when a session ends, so idle runs are removed by age and size instead.
+SPOOL_ROOT = os.path.join(tempfile.gettempdir(), "chunkify_spools")
+SPOOL_MAX_BYTES = 2 * 1024 ** 3
+SPOOL_MAX_AGE = 3600  # seconds since a run was last viewed
 
 # Streamlit Page Config
 st.set_page_config(
@@ -21,72 +29,113 @@ st.markdown("Upload a `.txt` or `.pdf` file, and I’ll split it into AI-friendl
 uploaded_file = st.file_uploader("📂 Upload your file", type=["txt", "pdf"])
 
 # Chunk size controls
-chunk_size = st.slider("📏 Chunk Size (characters)", 500, 3000, 1000, 100)
-chunk_overlap = st.slider("🔄 Chunk Overlap (characters)", 0, 500, 200, 50)
+mode = st.radio("🧮 Measure chunks in", ["characters", "tokens"], horizontal=True)
+if mode == "tokens":
+    chunk_size = st.slider("📏 Chunk Size (tokens)", 64, 1024, 256, 32)
+    chunk_overlap = st.slider("🔄 Chunk Overlap (tokens)", 0, 128, 32, 8)
+    st.caption(f"Tokenizer: {load_token_counter()[1]}")
+else:
+    chunk_size = st.slider("📏 Chunk Size (characters)", 500, 3000, 1000, 100)
+    chunk_overlap = st.slider("🔄 Chunk Overlap (characters)", 0, 500, 200, 50)
+
+# Near-duplicate removal (repeated headers, footers, boilerplate clauses)
+dedup_on = st.checkbox("🧬 Detect near-duplicate chunks")
+if dedup_on:
+    dedup_threshold = st.slider("Similarity threshold", 0.5, 1.0, 0.8, 0.05)
+    dedup_mode = st.radio("Duplicates", ["drop", "link"], horizontal=True,
+                          help="drop: leave them out of the export; link: keep them with a 'Duplicate Of' column")
 
 if uploaded_file:
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-        tmp_file.write(uploaded_file.read())
-        temp_path = tmp_file.name
-
-    # Load the file
-    if uploaded_file.name.endswith(".txt"):
-        loader = TextLoader(temp_path, encoding="utf-8")
-    elif uploaded_file.name.endswith(".pdf"):
-        loader = PyPDFLoader(temp_path)
-    else:
+    if not uploaded_file.name.endswith((".txt", ".pdf")):
         st.error("❌ Unsupported file type")
         st.stop()
 
-    st.info("⏳ Loading document...")
-    documents = loader.load()
-
-    # Progress bar
-    progress = st.progress(0)
-    time.sleep(0.5)  # Small delay for smooth animation
-
-    # Split into chunks
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-    )
-
-    st.info("✂️ Splitting document into chunks...")
-    docs = splitter.split_documents(documents)
-
-    # Simulate progress bar filling
-    for i in range(100):
-        time.sleep(0.005)
-        progress.progress(i + 1)
-
-    st.success(f"✅ Document split successfully into **{len(docs)}** chunks!")
-
-    # Convert chunks to DataFrame
-    chunk_data = [{"Chunk #": i + 1, "Content": chunk.page_content} for i, chunk in enumerate(docs)]
-    df_chunks = pd.DataFrame(chunk_data)
+    timings = Timings()
+    with timings.stage("upload"):
+        size = uploaded_file.size
+        uploaded_file.seek(0)
+
+    # Split into chunks (PDF pages are split on a process pool)
+    config = SplitConfig(chunk_size, chunk_overlap, "tokens" if mode == "tokens" else "chars")
+
+    # Streamlit reruns this script on every click, so the chunks of the current file and
+    # settings are kept (spooled to disk) in the session and only re-split when they change,
+    # or when the spool was pruned while the session sat idle.
+    run_key = (uploaded_file.name, size, config, dedup_threshold if dedup_on else None,
+               dedup_mode if dedup_on else None)
+    run = st.session_state.get("chunk_run")
+    if run is None or run["key"] != run_key or not os.path.exists(run["spool"]):
+        if run is not None:
+            shutil.rmtree(run["dir"], ignore_errors=True)
+        os.makedirs(SPOOL_ROOT, exist_ok=True)
+        prune_spools(SPOOL_ROOT, SPOOL_MAX_BYTES, SPOOL_MAX_AGE)
+
+        # The upload is read block by block (or page by page) and every chunk is written to
+        # a JSONL spool as soon as it is produced; only the preview stays in memory.
+        st.info("✂️ Splitting document into chunks...")
+        progress = st.progress(0)
+        shown = [0]
+
+        def report(fraction):
+            # bytes read (text) or pages done (PDF); only redraw when the percentage moves
+            pct = int(fraction * 100)
+            if pct != shown[0]:
+                shown[0] = pct
+                progress.progress(pct)
+
+        out_dir = tempfile.mkdtemp(dir=SPOOL_ROOT)
+        spool_path = os.path.join(out_dir, "document_chunks.jsonl")
+        preview, metrics = chunk_file(uploaded_file, uploaded_file.name, config,
+                                      ChunkSpool(spool_path), size=size,
+                                      progress=report, timings=timings, processes=os.cpu_count() or 1,
+                                      dedup=NearDuplicateFilter(dedup_threshold) if dedup_on else None,
+                                      dedup_mode=dedup_mode if dedup_on else "drop")
+        progress.progress(100)
+        run = st.session_state["chunk_run"] = {"key": run_key, "dir": out_dir, "spool": spool_path,
+                                               "preview": preview, "metrics": metrics, "exports": {}}
+    else:
+        os.utime(run["dir"])  # in use: the last to be pruned
+    preview, metrics = run["preview"], run["metrics"]
+
+    st.success(f"✅ Document split successfully into **{metrics['chunks']}** chunks!")
+    st.caption("⏱️ " + " · ".join(f"{stage} {secs * 1e3:,.0f} ms" for stage, secs in metrics["seconds"].items())
+               + f" · {metrics['chunks_per_sec'] or 0:,.0f} chunks/s")
+    if "dedup" in metrics:
+        d = metrics["dedup"]
+        verb = "Dropped" if d["mode"] == "drop" else "Linked"
+        st.info(f"🧬 {verb} **{d['duplicates']}** near-duplicate chunks ({d['share']:.0%}): "
+                f"{d['chars']:,} characters / ~{d['tokens']:,} tokens that would not need storing or embedding.")
+    with st.expander("📊 Metrics"):
+        st.json(metrics)
+        st.download_button(
+            label="💾 Download metrics (JSON)",
+            data=json.dumps(metrics, indent=2),
+            file_name="chunk_metrics.json",
+            mime="application/json",
+        )
 
     # Preview first few chunks
     with st.expander("📜 Preview First Few Chunks"):
-        for i, row in df_chunks.head(5).iterrows():
+        for row in preview:
             st.markdown(f"**Chunk {row['Chunk #']}**")
             st.write(row["Content"])
             st.markdown("---")
 
-    # Download buttons
-    st.download_button(
-        label="💾 Download as CSV",
-        data=df_chunks.to_csv(index=False).encode("utf-8"),
-        file_name="document_chunks.csv",
-        mime="text/csv",
-    )
-
-    st.download_button(
-        label="💾 Download as JSON",
-        data=df_chunks.to_json(orient="records", indent=2).encode("utf-8"),
-        file_name="document_chunks.json",
-        mime="application/json",
-    )
-
-    # Cleanup temp file
-    os.remove(temp_path)
+    # Download: an export is only built (from the spool) for the format asked for, once
+    fmt = st.selectbox("📦 Export format", available_formats(),
+                       help="parquet/arrow and jsonl.gz/.zst carry the same columns: chunk number, content, "
+                            "source file, page and character offsets")
+    suffix, mime = FORMATS[fmt]
+    export_path = os.path.join(run["dir"], "document_chunks" + suffix)
+    if fmt not in run["exports"] and st.button(f"⚙️ Prepare {fmt} export"):
+        with st.spinner(f"Writing {fmt}..."):
+            export_file(run["spool"], fmt, export_path)
+        run["exports"][fmt] = os.path.getsize(export_path)
+    if fmt in run["exports"]:
+        with open(export_path, "rb") as f:
+            st.download_button(
+                label=f"💾 Download as {fmt} ({run['exports'][fmt] / 1e6:,.2f} MB)",
+                data=f,
+                file_name="document_chunks" + suffix,
+                mime=mime,
+            )
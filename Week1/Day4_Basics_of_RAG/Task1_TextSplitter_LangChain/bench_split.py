@@ -0,0 +1,62 @@
+"""Character vs. token splitting, serial vs. parallel, on the sample PDF repeated N times.
+
+Run: python bench_split.py [copies] [processes]
+"""
+import io
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+
+from stream_split import iter_pdf_pages
+from token_split import SplitConfig, load_token_counter, split_pdf_parallel
+
+SAMPLE = Path(__file__).resolve().parent / "Input_Document" / "cloud computing training.pdf"
+
+
+def repeated_pdf(copies: int) -> bytes:
+    writer = PdfWriter()
+    for _ in range(copies):
+        writer.append(PdfReader(SAMPLE))
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def distribution(chunks, count) -> str:
+    sizes = sorted(count(c) for c in chunks)
+    p95 = sizes[int(0.95 * (len(sizes) - 1))]
+    return f"tokens/chunk min {sizes[0]} median {statistics.median(sizes):.0f} p95 {p95} max {sizes[-1]}"
+
+
+if __name__ == "__main__":
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    data = repeated_pdf(copies)
+    pages = list(iter_pdf_pages(io.BytesIO(data)))
+    count, label = load_token_counter()
+    print(f"{len(pages)} pages, {sum(len(t) for _, t in pages) / 1e6:.1f} M chars, tokenizer: {label}")
+
+    # 1000 characters and 256 tokens are roughly the same budget for English text
+    configs = {"chars 1000/200": SplitConfig(1000, 200), "tokens 256/32": SplitConfig(256, 32, "tokens")}
+    for name, config in configs.items():
+        splitter = config.make_splitter()
+        start = time.perf_counter()
+        chunks = [c for _, text in pages for c in splitter.split_text(text)]
+        elapsed = time.perf_counter() - start
+        print(f"  split {name:<16}{len(chunks):>6} chunks  {len(chunks) / elapsed:>10,.0f} chunks/s  "
+              + distribution(chunks, count))
+
+    for name, config in configs.items():
+        splitter = config.make_splitter()
+        start = time.perf_counter()
+        serial = [c for _, text in iter_pdf_pages(io.BytesIO(data)) for c in splitter.split_text(text)]
+        t_serial = time.perf_counter() - start
+        start = time.perf_counter()
+        parallel = [c for _, pairs in split_pdf_parallel(data, config, processes) for _, c in pairs]
+        t_parallel = time.perf_counter() - start
+        print(f"  extract+split {name:<16} serial {t_serial:6.2f} s  {processes} processes {t_parallel:6.2f} s  "
+              f"same chunks: {serial == parallel}")
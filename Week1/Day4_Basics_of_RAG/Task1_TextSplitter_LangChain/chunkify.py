@@ -0,0 +1,216 @@
+"""The Chunkify pipeline (load -> split -> serialise) shared by LangChains_A4.py and the command line.
+
+Run headless: python chunkify.py file.pdf [file.txt ...] --out-dir chunks --metrics metrics.jsonl
+              [--format parquet --format jsonl.gz ...]
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+from stream_split import iter_pdf_pages, iter_text_blocks, split_stream, split_with_offsets
+from token_split import SplitConfig, load_token_counter, split_pdf_parallel
+from dedup import NearDuplicateFilter
+from exports import FORMATS, ChunkSpool, available_formats, export_file
+
+STAGES = ("upload", "load", "split", "serialise")
+
+
+class Timings:
+    """Seconds per pipeline stage."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed_iter(self, stage: str, items: Iterable) -> Iterator:
+        """Yield from ``items``, charging the time spent producing each item to ``stage``."""
+        it = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start)
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+
+class _ProgressReader:
+    """File wrapper that reports the fraction of ``total`` bytes read so far."""
+
+    def __init__(self, stream: IO[bytes], total: Optional[int], progress: Optional[Callable[[float], None]]):
+        self.stream, self.total, self.progress, self.done = stream, total, progress, 0
+
+    def read(self, n: int = -1) -> bytes:
+        data = self.stream.read(n)
+        self.done += len(data)
+        if self.progress and self.total:
+            self.progress(min(1.0, self.done / self.total))
+        return data
+
+
+def chunk_file(stream: IO[bytes], name: str, config: SplitConfig, exporter: ChunkSpool, size: Optional[int] = None,
+               progress: Optional[Callable[[float], None]] = None, timings: Optional[Timings] = None,
+               preview: int = 5, processes: int = 1, dedup: Optional[NearDuplicateFilter] = None,
+               dedup_mode: str = "drop") -> Tuple[List[dict], dict]:
+    """Chunk one ``.txt``/``.pdf`` stream into ``exporter``; returns the first ``preview`` rows and metrics.
+
+    ``progress`` is called with the fraction done: bytes read for text, pages for PDFs.
+    With ``processes`` > 1, PDF pages are extracted and split on a process pool; their
+    time is then reported as "split". With a ``dedup`` filter, near-duplicate chunks are
+    left out (``dedup_mode="drop"``) or kept with a "Duplicate Of" chunk number ("link").
+
+    Each row carries its "Source" (``name``), "Page" (PDFs) and the "Start"/"End" character
+    offsets of the chunk in the page text, or in the whole file for text files.
+    """
+    timings = timings or Timings()
+    splitter = config.make_splitter()
+    pages = None
+    if name.lower().endswith(".pdf"):
+        with timings.stage("load"):
+            data = stream.read()
+            reader = PdfReader(io.BytesIO(data))
+            pages = len(reader.pages)
+
+        def texts():
+            if processes > 1:
+                for page_no, pairs in timings.timed_iter("split", split_pdf_parallel(data, config, processes)):
+                    yield from ((page_no, start, chunk) for start, chunk in pairs)
+                    if progress:
+                        progress(page_no / pages)
+                return
+            for page_no, text in timings.timed_iter("load", iter_pdf_pages(reader)):
+                with timings.stage("split"):
+                    pairs = split_with_offsets(text, splitter)
+                yield from ((page_no, start, chunk) for start, chunk in pairs)
+                if progress:
+                    progress(page_no / pages)
+        produced = texts()
+    else:
+        load_before = timings.seconds["load"]
+        blocks = timings.timed_iter("load", iter_text_blocks(_ProgressReader(stream, size, progress)))
+        produced = ((None, start, chunk) for start, chunk in
+                    timings.timed_iter("_produce", split_stream(blocks, splitter)))
+
+    rows = []
+    count = dup_count = dup_chars = dup_tokens = 0
+    count_tokens = load_token_counter(config.tokenizer)[0]
+    for page_no, start, text in produced:
+        if dedup is not None:
+            with timings.stage("dedup"):
+                dup_of = dedup.check(text, count + 1)
+            if dup_of is not None:
+                dup_count += 1
+                dup_chars += len(text)
+                dup_tokens += count_tokens(text)
+                if dedup_mode == "drop":
+                    continue
+        count += 1
+        row = {"Chunk #": count, "Content": text, "Source": name, "Page": page_no,
+               "Start": start, "End": None if start is None else start + len(text)}
+        if dedup is not None and dedup_mode == "link":
+            row["Duplicate Of"] = dup_of
+        with timings.stage("serialise"):
+            exporter.write(row)
+        if len(rows) < preview:
+            rows.append(row)
+    with timings.stage("serialise"):
+        exporter.close()
+    if pages is None:
+        # split_stream pulls blocks itself, so its time includes loading them
+        timings.add("split", timings.seconds.pop("_produce", 0.0) - (timings.seconds["load"] - load_before))
+
+    total = sum(timings.seconds.values())
+    metrics = {
+        "file": name,
+        "bytes": size,
+        "pages": pages,
+        "chunks": count,
+        "mode": config.mode,
+        "tokenizer": load_token_counter(config.tokenizer)[1] if config.mode == "tokens" else None,
+        "chunk_size": config.chunk_size,
+        "chunk_overlap": config.chunk_overlap,
+        "seconds": {k: round(v, 6) for k, v in timings.seconds.items()},
+        "total_seconds": round(total, 6),
+        "chunks_per_sec": round(count / total, 1) if total else None,
+    }
+    if dedup is not None:
+        # duplicates are chunks the index would store and embed for nothing
+        seen = count + (dup_count if dedup_mode == "drop" else 0)
+        metrics["dedup"] = {"threshold": dedup.threshold, "mode": dedup_mode, "duplicates": dup_count,
+                            "chars": dup_chars, "tokens": dup_tokens,
+                            "share": round(dup_count / seen, 4) if seen else 0.0}
+    return rows, metrics
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Split .txt/.pdf files into chunks without the Streamlit UI.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--mode", choices=("chars", "tokens"), default="chars")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="characters or tokens, see --mode")
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--tokenizer", default="cl100k_base", help="tiktoken encoding or Hugging Face tokenizer")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="PDF pages split in parallel")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--format", dest="formats", action="append", choices=available_formats(),
+                        help="export format, repeatable (default: csv and json)")
+    parser.add_argument("--dedup-threshold", type=float,
+                        help="drop (or link) chunks whose estimated Jaccard similarity to an earlier one is at least this")
+    parser.add_argument("--dedup-mode", choices=("drop", "link"), default="drop")
+    parser.add_argument("--metrics", help="append one JSON line of metrics per file to this path")
+    args = parser.parse_args(argv)
+
+    config = SplitConfig(args.chunk_size, args.chunk_overlap, args.mode, args.tokenizer)
+    formats = list(dict.fromkeys(args.formats or ["csv", "json"]))
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for path in map(Path, args.files):
+        timings = Timings()
+        with timings.stage("upload"):
+            src = open(path, "rb")
+        stem = out_dir / f"{path.stem}_chunks"
+        fd, spool_path = tempfile.mkstemp(suffix=".jsonl", dir=out_dir)
+        os.close(fd)
+        try:
+            with src:
+                _, metrics = chunk_file(src, path.name, config, ChunkSpool(spool_path),
+                                        size=os.path.getsize(path), timings=timings, preview=0,
+                                        processes=args.processes, dedup_mode=args.dedup_mode,
+                                        dedup=NearDuplicateFilter(args.dedup_threshold) if args.dedup_threshold else None)
+            exported = {}
+            for fmt in formats:
+                target = f"{stem}{FORMATS[fmt][0]}"
+                start = time.perf_counter()
+                export_file(spool_path, fmt, target)
+                exported[fmt] = {"seconds": round(time.perf_counter() - start, 6), "bytes": os.path.getsize(target)}
+            metrics["exports"] = exported
+        finally:
+            os.remove(spool_path)
+        line = json.dumps(metrics)
+        print(line)
+        if args.metrics:
+            with open(args.metrics, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
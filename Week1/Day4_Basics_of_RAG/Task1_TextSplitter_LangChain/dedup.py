@@ -0,0 +1,68 @@
+"""Near-duplicate chunk detection for Chunkify (MinHash signatures + LSH banding).
+
+Each chunk is reduced to a MinHash signature over its word 3-shingles; signatures are
+bucketed band by band, so a new chunk is only compared with chunks that share a bucket
+(sub-quadratic overall). Candidates count as duplicates when their estimated Jaccard
+similarity reaches ``threshold``.
+"""
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+WORD = re.compile(r"\w+")
+PRIME = (1 << 31) - 1
+
+
+def _bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows <= num_perm whose S-curve midpoint (1/b)^(1/r) is closest to ``threshold``."""
+    pairs = [(b, num_perm // b) for b in range(1, num_perm + 1)]
+    return min(pairs, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class NearDuplicateFilter:
+    """Streaming near-duplicate detector: ``check(text)`` returns the id of an earlier near-duplicate, or None.
+
+    Texts that are not duplicates are remembered under the id passed to ``check``.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, shingle: int = 3, seed: int = 1):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.shingle = shingle
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, PRIME, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = _bands(num_perm, threshold)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[int, np.ndarray] = {}
+        self.checked = self.duplicates = self.candidates = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        words = WORD.findall(text.lower())
+        n = self.shingle
+        grams = [" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))] if words else [text]
+        h = np.fromiter((zlib.crc32(g.encode("utf-8")) % PRIME for g in set(grams)), dtype=np.uint64)
+        return ((np.outer(self._a, h) + self._b[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+    def check(self, text: str, key: int) -> Optional[int]:
+        sig = self.signature(text)
+        self.checked += 1
+        r = self.rows
+        band_keys = [sig[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+        seen = set()
+        for bucket, band_key in zip(self._buckets, band_keys):
+            for other in bucket.get(band_key, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                self.candidates += 1
+                if np.mean(self._signatures[other] == sig) >= self.threshold:
+                    self.duplicates += 1
+                    return other
+        self._signatures[key] = sig
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket.setdefault(band_key, []).append(key)
+        return None
@@ -0,0 +1,192 @@
+"""Chunk exports for Chunkify: a JSON Lines spool written while chunking, converted on demand.
+
+Every chunk row is written once, to a plain JSONL spool. CSV, JSON, compressed JSONL,
+Parquet and Arrow IPC are produced from the spool only when someone asks for them,
+streaming row by row (or record batch by record batch), so an export nobody downloads
+costs nothing and a large one never sits in memory whole.
+
+Parquet/Arrow need ``pyarrow`` and zstd needs ``zstandard``; formats whose library is
+missing are left out of ``available_formats()``.
+
+Each run's spool and exports live in one directory under a shared root; ``prune_spools()``
+keeps that root bounded, since nothing tells the app when a session has ended.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import time
+from typing import IO, Iterable, Iterator, List
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# format -> (file suffix, MIME type)
+FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "json": (".json", "application/json"),
+    "jsonl": (".jsonl", "application/jsonl"),
+    "jsonl.gz": (".jsonl.gz", "application/gzip"),
+    "jsonl.zst": (".jsonl.zst", "application/zstd"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+# column types for the columnar formats; Page/Start/End/Duplicate Of may be null
+COLUMN_TYPES = {
+    "Chunk #": "int64",
+    "Content": "string",
+    "Source": "string",
+    "Page": "int32",
+    "Start": "int64",
+    "End": "int64",
+    "Duplicate Of": "int64",
+}
+
+BATCH_ROWS = 10_000
+
+
+def available_formats() -> List[str]:
+    """Formats that can be written with the libraries installed here."""
+    missing = set()
+    if pa is None:
+        missing |= {"parquet", "arrow"}
+    if zstandard is None:
+        missing.add("jsonl.zst")
+    return [fmt for fmt in FORMATS if fmt not in missing]
+
+
+class ChunkSpool:
+    """Writes chunk rows to a JSON Lines file as they are produced; the source for every export."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, row: dict):
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def iter_rows(spool_path: str) -> Iterator[dict]:
+    with open(spool_path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _batches(spool_path: str, size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in iter_rows(spool_path):
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _schema(row: dict):
+    return pa.schema([(name, getattr(pa, COLUMN_TYPES.get(name, "string"))()) for name in row])
+
+
+def _columnar_writer(out: IO[bytes], fmt: str, schema):
+    if fmt == "parquet":
+        return pq.ParquetWriter(out, schema, compression="zstd")
+    return pa.ipc.new_file(out, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+
+def _write_columnar(spool_path: str, out: IO[bytes], fmt: str, batch_rows: int):
+    writer = schema = None
+    for batch in _batches(spool_path, batch_rows):
+        if writer is None:
+            schema = _schema(batch[0])
+            writer = _columnar_writer(out, fmt, schema)
+        writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+    if writer is None:  # no chunks: still a valid, empty file
+        empty = dict.fromkeys(("Chunk #", "Content", "Source", "Page", "Start", "End"))
+        writer = _columnar_writer(out, fmt, _schema(empty))
+    writer.close()
+
+
+def export(spool_path: str, fmt: str, out: IO[bytes], batch_rows: int = BATCH_ROWS):
+    """Write the spooled rows to the binary file ``out`` in ``fmt`` (a key of ``FORMATS``)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    if fmt not in available_formats():
+        raise RuntimeError(f"{fmt} export needs {'zstandard' if fmt == 'jsonl.zst' else 'pyarrow'} installed")
+    if fmt in ("jsonl", "jsonl.gz", "jsonl.zst"):
+        # the spool already is JSON Lines; only the compression differs
+        with open(spool_path, "rb") as src:
+            if fmt == "jsonl":
+                shutil.copyfileobj(src, out)
+            elif fmt == "jsonl.gz":
+                with gzip.GzipFile(fileobj=out, mode="wb", mtime=0) as gz:
+                    shutil.copyfileobj(src, gz)
+            else:
+                with zstandard.ZstdCompressor().stream_writer(out, closefd=False) as zst:
+                    shutil.copyfileobj(src, zst)
+    elif fmt in ("parquet", "arrow"):
+        _write_columnar(spool_path, out, fmt, batch_rows)
+    else:
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+        if fmt == "csv":
+            writer = None
+            for row in iter_rows(spool_path):
+                if writer is None:
+                    writer = csv.writer(text)
+                    writer.writerow(list(row))
+                writer.writerow(list(row.values()))
+        else:
+            n = 0
+            text.write("[")
+            for n, row in enumerate(iter_rows(spool_path), 1):
+                text.write(("," if n > 1 else "") + "\n  " + json.dumps(row, ensure_ascii=False))
+            text.write("\n]\n" if n else "]\n")
+        text.flush()
+        text.detach()
+
+
+def export_file(spool_path: str, fmt: str, path: str):
+    with open(path, "wb") as out:
+        export(spool_path, fmt, out)
+
+
+def _tree_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def prune_spools(root: str, max_bytes: int, max_age: float, keep: Iterable[str] = ()) -> int:
+    """Delete run directories under ``root`` unused for ``max_age`` seconds, then the least
+    recently used ones until the rest fit in ``max_bytes``; returns bytes freed.
+
+    A directory's mtime is its last use (the app touches it on every rerun); ``keep`` is
+    never deleted.
+    """
+    keep = {os.path.abspath(k) for k in keep}
+    runs = []
+    for entry in os.scandir(root):
+        if entry.is_dir() and os.path.abspath(entry.path) not in keep:
+            runs.append((entry.stat().st_mtime, entry.path, _tree_bytes(entry.path)))
+    total = sum(size for *_, size in runs) + sum(_tree_bytes(k) for k in keep if os.path.isdir(k))
+    freed, now = 0, time.time()
+    for mtime, path, size in sorted(runs):  # oldest first
+        if now - mtime < max_age and total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        freed += size
+    return freed
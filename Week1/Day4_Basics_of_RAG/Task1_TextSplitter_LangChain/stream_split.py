@@ -0,0 +1,114 @@
+"""Streaming chunking engine for LangChains_A4.py (Chunkify).
+
+Text files are read in fixed-size blocks and split through a sliding window; PDFs are
+read page by page. Chunks come out of a generator, with their character offsets, and are
+written out as they arrive, so memory stays flat no matter how big the upload is.
+"""
+import codecs
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+BLOCK_SIZE = 1 << 20  # 1 MiB
+
+
+def iter_text_blocks(stream: IO[bytes], block_size: int = BLOCK_SIZE, encoding: str = "utf-8") -> Iterator[str]:
+    """Decoded text in ``block_size``-byte reads; multi-byte characters split by a read are kept whole."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _starts(text: str, chunks: List[str], overlap: int, length: Callable[[str], int] = len) -> List[int]:
+    """Start offset of each chunk in ``text``, -1 for one that cannot be found.
+
+    Each chunk starts after the previous chunk's start, so it is looked up from just past
+    that start. A chunk that starts inside the previous one repeats at most ``overlap`` of
+    it, measured with ``length`` like the splitter measures (tokens in token mode), so
+    matches further back are skipped. The search never runs past the true start and never
+    goes back to the start of ``text``.
+    """
+    starts, lo, prev_end = [], 0, 0
+    for chunk in chunks:
+        i = text.find(chunk, lo)
+        while 0 <= i < prev_end and length(text[i:prev_end]) > overlap:
+            i = text.find(chunk, i + 1)
+        starts.append(i)
+        if i >= 0:
+            lo, prev_end = i + 1, i + len(chunk)
+    return starts
+
+
+def split_with_offsets(text: str, splitter) -> List[Tuple[Optional[int], str]]:
+    """``(start, chunk)`` pairs for ``splitter.split_text(text)``; start is None if a chunk cannot be located."""
+    chunks = splitter.split_text(text)
+    starts = _starts(text, chunks, splitter._chunk_overlap, splitter._length_function)
+    return [(i if i >= 0 else None, chunk) for i, chunk in zip(starts, chunks)]
+
+
+def split_stream(blocks: Iterable[str], splitter,
+                 window: int = 4 * BLOCK_SIZE) -> Iterator[Tuple[Optional[int], str]]:
+    """Split a stream of text blocks with ``splitter``, close to ``splitter.split_text`` on their concatenation.
+
+    Yields ``(start, chunk)``, ``start`` being the chunk's character offset in the whole text.
+
+    A buffer of about ``window`` characters is split; chunks ending more than one
+    ``chunk_size`` before the end of the buffer are final and emitted, and the buffer is
+    cut at the start of the first chunk held back (moved back to a paragraph start when
+    there is one). That chunk still begins with its overlap, so ``chunk_overlap``
+    carries across block boundaries. The splitter merges pieces greedily, so the chunks
+    right after a cut can differ from a whole-text split; this happens rarely when
+    paragraph breaks are common and the window is much larger than ``chunk_size``, and
+    more often for text without ``"\n\n"`` or with small windows. Every chunk still fits
+    ``chunk_size``, and the chunks cover the text in order, skipping only whitespace; in
+    token mode too, since chunk starts are located by character position (``_starts``).
+    """
+    size, overlap, length = splitter._chunk_size, splitter._chunk_overlap, splitter._length_function
+    window = max(window, 4 * size)
+    buf, base = "", 0  # base: characters of the text already cut off the front of buf
+    for block in blocks:
+        buf += block
+        if len(buf) < window:
+            continue
+        chunks = splitter.split_text(buf)
+        starts = _starts(buf, chunks, overlap, length)
+        # hold back the last chunk_size worth of text, measured like the splitter measures
+        # (tokens, with a token-length splitter)
+        margin = size
+        while margin < len(buf) and length(buf[-margin:]) < size:
+            margin *= 2
+        safe = len(buf) - margin
+        keep = len(chunks)
+        for n, (chunk, start) in enumerate(zip(chunks, starts)):
+            if start < 0 or start + len(chunk) > safe:
+                keep = n
+                break
+        # prefer restarting at a chunk that opens a paragraph: the splitter's greedy merge
+        # starts afresh there, so the re-split buffer reproduces the whole-text chunks
+        sep = splitter._separators[0] if getattr(splitter, "_separators", None) else "\n\n"
+        para = [n for n in range(1, keep + 1) if n < len(chunks) and buf.startswith(sep, starts[n] - len(sep))]
+        if para:
+            keep = para[-1]
+        if keep == 0:
+            continue  # nothing final yet (e.g. no separators); read on
+        yield from ((base + start, chunk) for start, chunk in zip(starts[:keep], chunks[:keep]))
+        cut = starts[keep] if keep < len(chunks) else starts[keep - 1] + len(chunks[keep - 1])
+        buf, base = buf[cut:], base + cut
+    if buf.strip():
+        yield from ((None if start is None else base + start, chunk) for start, chunk in split_with_offsets(buf, splitter))
+
+
+def iter_pdf_pages(stream) -> Iterator[Tuple[int, str]]:
+    """``(page_no, text)`` one page at a time, 1-based; ``stream`` may also be an open PdfReader."""
+    reader = stream if isinstance(stream, PdfReader) else PdfReader(stream)
+    for i, page in enumerate(reader.pages):
+        yield i + 1, page.extract_text() or ""
+
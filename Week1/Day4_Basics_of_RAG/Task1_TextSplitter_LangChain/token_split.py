@@ -0,0 +1,89 @@
+"""Token-aware splitting and parallel page splitting for Chunkify.
+
+Token counts come from the first tokenizer available locally: tiktoken, then a cached
+Hugging Face tokenizer, then a regex word/punctuation approximation. Counts are
+memoised, since the recursive splitter measures the same pieces over and over.
+"""
+import io
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+from stream_split import split_with_offsets
+
+APPROX_TOKEN = re.compile(r"\w+|[^\w\s]")
+HF_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"  # the embedding model the RAG tasks use
+
+
+@lru_cache(maxsize=None)
+def load_token_counter(tokenizer: str = "cl100k_base") -> Tuple[Callable[[str], int], str]:
+    """A memoised ``len(tokens(text))`` function and a label saying which tokenizer backs it."""
+    count = label = None
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding(tokenizer)
+        count, label = (lambda text: len(enc.encode(text, disallowed_special=()))), f"tiktoken:{tokenizer}"
+    except Exception:  # not installed, or the encoding is not cached and there is no network
+        pass
+    if count is None:
+        try:
+            from transformers import AutoTokenizer
+            name = tokenizer if "/" in tokenizer else HF_TOKENIZER
+            tok = AutoTokenizer.from_pretrained(name, local_files_only=True)
+            count, label = (lambda text: len(tok.encode(text, add_special_tokens=False))), f"hf:{name}"
+        except Exception:
+            count, label = (lambda text: len(APPROX_TOKEN.findall(text))), "approx (words + punctuation)"
+    return lru_cache(maxsize=1 << 16)(count), label
+
+
+@dataclass(frozen=True)
+class SplitConfig:
+    """What to split by; picklable, so process-pool workers can rebuild the splitter."""
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+    mode: str = "chars"  # or "tokens"
+    tokenizer: str = "cl100k_base"
+
+    def make_splitter(self) -> RecursiveCharacterTextSplitter:
+        if self.mode == "tokens":
+            count, _ = load_token_counter(self.tokenizer)
+            return RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap,
+                                                  length_function=count)
+        if self.mode != "chars":
+            raise ValueError(f"unknown split mode {self.mode!r}; expected 'chars' or 'tokens'")
+        return RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+
+
+_WORKER = {}
+
+
+def _init_worker(data: bytes, config: SplitConfig):
+    _WORKER["reader"] = PdfReader(io.BytesIO(data))
+    _WORKER["splitter"] = config.make_splitter()
+
+
+PageChunks = Tuple[int, List[Tuple[Optional[int], str]]]  # (page_no, [(start, chunk), ...])
+
+
+def _split_range(bounds: Tuple[int, int]) -> List[PageChunks]:
+    reader, splitter = _WORKER["reader"], _WORKER["splitter"]
+    return [(i + 1, split_with_offsets(reader.pages[i].extract_text() or "", splitter)) for i in range(*bounds)]
+
+
+def split_pdf_parallel(data: bytes, config: SplitConfig, processes: int,
+                       pages_per_task: int = 8) -> Iterator[PageChunks]:
+    """``(page_no, [(start, chunk), ...])`` in page order; each worker extracts and splits runs of pages.
+
+    ``start`` is the chunk's character offset in the page text.
+    """
+    n = len(PdfReader(io.BytesIO(data)).pages)
+    ranges = [(i, min(i + pages_per_task, n)) for i in range(0, n, pages_per_task)]
+    with ProcessPoolExecutor(min(processes, max(1, len(ranges))), initializer=_init_worker,
+                             initargs=(data, config)) as pool:
+        for batch in pool.map(_split_range, ranges):
+            yield from batch
@@ -1,59 +1,158 @@
 import streamlit as st
-from langchain.chains import RetrievalQA
+from langchain.chains.question_answering import load_qa_chain
 from langchain.vectorstores import FAISS
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.llms import HuggingFacePipeline
 from langchain.text_splitter import CharacterTextSplitter
-import PyPDF2
 import os
 import hashlib
+import time
 from transformers import pipeline
+from pdf_ingest import cite_pages, iter_pages, split_pages
+from embedding_cache import CachedEmbeddings
+from qa_cache import StageTimings, VectorStoreLRU
+from ann_index import build_vector_store
+from batch_qa import answer_batch, read_questions, to_csv
+from corpus import Corpus
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+VECTOR_STORE_BUDGET = 512 * 1024 * 1024  # bytes of FAISS stores kept in RAM across sessions
+INDEX_TYPE = "auto"  # or flat / flat_fp16 / hnsw / ivf_flat / ivfpq, see ann_index.py and bench_ann.py
+
+# ---- Process-wide resources: loaded once, shared by every session and rerun ----
+@st.cache_resource
+def load_embeddings():
+    return CachedEmbeddings(HuggingFaceEmbeddings(model_name=MODEL_NAME), MODEL_NAME)
+
+@st.cache_resource
+def load_llm():
+    pipe = pipeline("text2text-generation", model="google/flan-t5-small")
+    return HuggingFacePipeline(pipeline=pipe)
+
+@st.cache_resource
+def load_chain():
+    # the "stuff" chain RetrievalQA.from_chain_type would build, minus the per-document retriever
+    return load_qa_chain(load_llm(), chain_type="stuff")
+
+@st.cache_resource
+def vector_stores():
+    return VectorStoreLRU(VECTOR_STORE_BUDGET)
+
+@st.cache_resource
+def load_corpus():
+    return Corpus(load_embeddings(), vector_stores(), kind=INDEX_TYPE)
+
+mode = st.sidebar.radio("Mode", ["📄 Single document", "📚 Corpus"])
+
+if mode == "📚 Corpus":
+    st.title("📚 Policy Corpus Q&A")
+    corpus = load_corpus()
+    uploads = st.file_uploader("📂 Add policy PDFs to the corpus", type=["pdf"], accept_multiple_files=True)
+    splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=200)
+    # a PDF re-uploaded under the same name replaces the earlier version; only the latest upload counts
+    for upload in {u.name: u for u in uploads or []}.values():
+        known = any(info["source"] == upload.name for info in corpus.docs.values())
+        _, added = corpus.add(upload.getvalue(), upload.name, splitter)
+        if added:
+            st.write(f"{'🔄 Replaced' if known else '✅ Added'} {upload.name}")
+
+    sources = sorted({info["source"] for info in corpus.docs.values()})
+    st.sidebar.caption(f"{len(corpus.docs)} documents · {sum(i['chunks'] for i in corpus.docs.values())} chunks · "
+                       f"{corpus.disk_bytes() / 1e6:.1f} MB on disk")
+    if st.sidebar.button("🗜️ Compact index"):
+        corpus.compact()
+        st.sidebar.success("Shards merged into one index.")
+    if st.sidebar.button("🧹 Clean up stale indexes"):
+        # the corpus has its own directory, so anything there it no longer references can go now
+        st.sidebar.success(f"Freed {corpus.gc(max_age=0) / 1e6:.1f} MB.")
+
+    if not corpus.docs:
+        st.info("👉 Add one or more PDF files to get started.")
+        st.stop()
+    selected = st.multiselect("Search in", sources, default=sources)
+    question = st.text_input("Ask a question across the corpus:")
+    if question and selected:
+        timings = StageTimings()
+        with st.spinner("🔍 Finding answer..."):
+            with timings.stage("retrieve"):
+                docs = corpus.search(question, k=3, sources=None if len(selected) == len(sources) else selected)
+            with timings.stage("generate"):
+                answer = load_chain().run(input_documents=docs, question=question)
+        st.markdown("### Answer:")
+        st.write(answer)
+        cited = {}
+        for d in docs:
+            cited.setdefault(d.metadata.get("source", ""), []).append(d)
+        st.caption("📑 Sources: " + "; ".join(f"{src} {cite_pages(ds)}" for src, ds in cited.items()))
+        st.caption(f"⏱️ {timings.summary()}")
+    st.stop()
 
 st.title("📄 Refund Policy Q&A")
 
 uploaded_file = st.file_uploader("📂 Upload your company policy PDF", type=["pdf"])
 
 if uploaded_file is not None:
-    pdf_reader = PyPDF2.PdfReader(uploaded_file)
-    full_text = ""
-    for page in pdf_reader.pages:
-        text = page.extract_text()
-        if text:
-            full_text += text + "\n"
-
-    st.write("✅ Text extracted from PDF!")
-
     file_bytes = uploaded_file.getvalue()
     doc_hash = hashlib.md5(file_bytes).hexdigest()
     index_path = f"faiss_index_{doc_hash}"
+    embeddings = load_embeddings()
+    timings = StageTimings()
 
-    text_splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=200)
-    texts = text_splitter.split_text(full_text)
+    def build_store():
+        if os.path.exists(index_path):
+            with timings.stage("load"):
+                # Allow loading pickle safely because it's your own file
+                store = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+            st.info("Loaded vector store from cache.")
+            return store
+        # pages are extracted in parallel and split one by one, so chunks remember their page
+        text_splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=200)
+        start = time.perf_counter()
+        pages = timings.timed_iter("extract", iter_pages(file_bytes))
+        texts, metadatas = split_pages(pages, text_splitter, source=uploaded_file.name)
+        timings.add("split", time.perf_counter() - start - timings.seconds["extract"])
+        st.write("✅ Text extracted from PDF!")
+        with timings.stage("embed"):
+            # only chunks not seen before (by text + model) are embedded; the rest come from the cache
+            store = build_vector_store(texts, embeddings, metadatas, kind=INDEX_TYPE)
+            store.save_local(index_path)
+        st.info("🆕 Created new vector store and cached it.\n"
+                f"♻️ Embedding cache: {embeddings.last_hits}/{len(texts)} chunks reused "
+                f"({embeddings.last_hit_rate:.0%} hit rate).")
+        return store
 
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    if os.path.exists(index_path):
-        # Allow loading pickle safely because it's your own file
-        vector_store = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
-        st.info("Loaded vector store from cache.")
-    else:
-        vector_store = FAISS.from_texts(texts, embeddings)
-        vector_store.save_local(index_path)
-        st.info("🗃️ Loaded cached vector store.\n🆕 Created new vector store and cached it.")
+    vector_store, in_memory = vector_stores().get_or_build(index_path, build_store)
+    if in_memory:
+        st.info("⚡ Vector store already in memory.")
 
     retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k":3})
 
-    pipe = pipeline("text2text-generation", model="google/flan-t5-small")
-    llm = HuggingFacePipeline(pipeline=pipe)
-
-    qa = RetrievalQA.from_chain_type(llm=llm, retriever=retriever)
-
     question = st.text_input("Ask a question about the uploaded document:")
 
     if question:
         with st.spinner("🔍 Finding answer..."):
-            answer = qa.run(question)
+            with timings.stage("retrieve"):
+                docs = retriever.get_relevant_documents(question)
+            with timings.stage("generate"):
+                answer = load_chain().run(input_documents=docs, question=question)
         st.markdown("### Answer:")
         st.write(answer)
+        citation = cite_pages(docs)
+        if citation:
+            st.caption(f"📑 Source: {citation}")
+    if timings.seconds:
+        st.caption(f"⏱️ {timings.summary()}")
+
+    with st.expander("📋 Batch questions (CSV)"):
+        questions_file = st.file_uploader("Upload a CSV with a 'question' column", type=["csv"])
+        if questions_file is not None and st.button("Answer all"):
+            questions = read_questions(questions_file.getvalue().decode("utf-8"))
+            with st.spinner(f"Answering {len(questions)} questions..."):
+                start = time.perf_counter()
+                results = answer_batch(questions, vector_store, embeddings, load_llm().pipeline)
+                elapsed = time.perf_counter() - start
+            st.success(f"✅ {len(results)} questions in {elapsed:.1f}s "
+                       f"({len(results) / max(elapsed, 1e-9):.1f} questions/s)")
+            st.download_button("⬇️ Download answers (CSV)", to_csv(results), file_name="answers.csv", mime="text/csv")
 else:
     st.info("👉 Please upload a PDF file to get started.")
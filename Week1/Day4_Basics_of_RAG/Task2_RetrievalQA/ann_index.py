@@ -0,0 +1,88 @@
+"""FAISS index types for RetrievalQA_A3.py, picked by corpus size unless asked for explicitly.
+
+    flat       exact search, float32 (FAISS.from_texts' default)
+    flat_fp16  exact search over float16 vectors: half the memory
+    hnsw       graph search over float16 vectors: fast, no training
+    ivf_flat   inverted lists (k-means cells) over float32 vectors
+    ivfpq      inverted lists over product-quantised codes: ~16x smaller than float32
+"""
+import math
+import uuid
+from typing import List, Optional
+
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.vectorstores import FAISS
+
+INDEX_TYPES = ("flat", "flat_fp16", "hnsw", "ivf_flat", "ivfpq")
+
+
+def choose_index_type(n: int) -> str:
+    """Exact search while it is cheap, HNSW for mid-sized corpora, IVF-PQ when memory dominates."""
+    if n < 20_000:
+        return "flat"
+    if n < 500_000:
+        return "hnsw"
+    return "ivfpq"
+
+
+def _nlist(n: int) -> int:
+    # ~4 sqrt(n) cells, but at least 39 training points per cell as FAISS recommends
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _pq_m(d: int) -> int:
+    # largest sub-quantiser count <= d / 4 that divides d (8-bit codes: d/4 bytes per vector)
+    return next(m for m in range(max(1, d // 4), 0, -1) if d % m == 0)
+
+
+def build_index(vectors: np.ndarray, kind: str = "auto", nprobe: Optional[int] = None,
+                ef_search: int = 64) -> faiss.Index:
+    """A trained L2 index of ``kind`` holding ``vectors`` (row i gets id i).
+
+    IVF kinds need at least 39 training vectors per cell (and per PQ code); smaller inputs
+    fall back to exact search: ``flat`` for ``ivf_flat``, ``flat_fp16`` for ``ivfpq``.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    kind = choose_index_type(n) if kind == "auto" else kind
+    if kind == "ivf_flat" and n < 39 * _nlist(n):
+        kind = "flat"  # too few vectors to train the cells; exact search is cheap here anyway
+    elif kind == "ivfpq" and n < 39 * max(_nlist(n), 2 ** 4):
+        kind = "flat_fp16"  # nor the smallest (4-bit) PQ codebooks, which FAISS aborts on
+    if kind == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif kind == "flat_fp16":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWSQ(d, faiss.ScalarQuantizer.QT_fp16, 32)
+        index.hnsw.efConstruction = 80
+        index.hnsw.efSearch = ef_search
+    elif kind in ("ivf_flat", "ivfpq"):
+        nlist = _nlist(n)
+        quantizer = faiss.IndexFlatL2(d)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            # 8-bit codebooks need ~256 * 39 training vectors; smaller corpora get 4-bit ones
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, _pq_m(d), 8 if n >= 256 * 39 else 4)
+        index.nprobe = nprobe or min(nlist, max(8, nlist // 16))
+    else:
+        raise ValueError(f"unknown index type {kind!r}; expected 'auto' or one of {INDEX_TYPES}")
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def build_vector_store(texts: List[str], embeddings, metadatas: Optional[List[dict]] = None,
+                       kind: str = "auto") -> FAISS:
+    """``FAISS.from_texts`` with a configurable index type; saves and loads like any FAISS store."""
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    index = build_index(vectors, kind)
+    metadatas = metadatas or [{} for _ in texts]
+    ids = [str(uuid.uuid4()) for _ in texts]
+    docstore = InMemoryDocstore({i: Document(page_content=t, metadata=m) for i, t, m in zip(ids, texts, metadatas)})
+    return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
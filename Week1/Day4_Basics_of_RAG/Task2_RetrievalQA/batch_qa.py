@@ -0,0 +1,106 @@
+"""Answer a whole CSV of questions against one policy PDF.
+
+All questions are embedded in one call, retrieved with a single FAISS query-matrix
+search, and generated in batches sorted by prompt length (so padding stays small).
+
+Run: python batch_qa.py questions.csv --pdf policy.pdf --out answers.jsonl
+"""
+import argparse
+import csv
+import io
+import json
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain.chains.question_answering.stuff_prompt import PROMPT
+
+
+def read_questions(text: str) -> List[str]:
+    """Questions from CSV text: the ``question`` column if there is one, else the first column."""
+    rows = [r for r in csv.reader(io.StringIO(text)) if r and r[0].strip()]
+    if rows and "question" in [c.strip().lower() for c in rows[0]]:
+        col = [c.strip().lower() for c in rows[0]].index("question")
+        return [r[col].strip() for r in rows[1:] if len(r) > col and r[col].strip()]
+    return [r[0].strip() for r in rows]
+
+
+def answer_batch(questions: List[str], vector_store, embeddings, pipe, k: int = 3,
+                 batch_size: int = 16, prompt=PROMPT) -> List[dict]:
+    """One result dict per question: answer, retrieved chunk ids and their pages.
+
+    ``pipe`` is the raw transformers text2text pipeline; ``prompt`` matches the "stuff"
+    chain used for single questions, so answers agree with the interactive path.
+    """
+    if not questions:
+        return []
+    # questions are not chunks: keep them out of the chunk-embedding cache and its stats
+    embed = getattr(embeddings, "embed_queries", embeddings.embed_documents)
+    qvecs = np.asarray(embed(questions), dtype=np.float32)
+    _, rows = vector_store.index.search(qvecs, k)
+    results, prompts = [], []
+    for question, hits in zip(questions, rows):
+        ids = [vector_store.index_to_docstore_id[int(i)] for i in hits if i >= 0]
+        docs = [vector_store.docstore.search(i) for i in ids]
+        context = "\n\n".join(d.page_content for d in docs)
+        prompts.append(prompt.format(context=context, question=question))
+        results.append({"question": question, "chunk_ids": ids,
+                        "pages": [d.metadata.get("page") for d in docs]})
+    order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+    outputs = pipe([prompts[i] for i in order], batch_size=batch_size)
+    for i, out in zip(order, outputs):
+        out = out[0] if isinstance(out, list) else out
+        results[i]["answer"] = out["generated_text"].strip()
+    return results
+
+
+def to_csv(results: List[dict]) -> str:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["question", "answer", "chunk_ids", "pages"])
+    for r in results:
+        writer.writerow([r["question"], r["answer"], " ".join(r["chunk_ids"]),
+                         " ".join(str(p) for p in r["pages"] if p is not None)])
+    return buf.getvalue()
+
+
+def to_jsonl(results: List[dict]) -> str:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in results)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", help="CSV with a 'question' column (or questions in the first column)")
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--out", default="answers.jsonl", help=".csv or .jsonl")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    from langchain.embeddings import HuggingFaceEmbeddings
+    from langchain.text_splitter import CharacterTextSplitter
+    from transformers import pipeline
+    from ann_index import build_vector_store
+    from embedding_cache import CachedEmbeddings
+    from pdf_ingest import iter_pages, split_pages
+
+    model_name = "sentence-transformers/all-MiniLM-L6-v2"
+    embeddings = CachedEmbeddings(HuggingFaceEmbeddings(model_name=model_name), model_name)
+    pipe = pipeline("text2text-generation", model="google/flan-t5-small")
+    splitter = CharacterTextSplitter(separator="\n", chunk_size=1000, chunk_overlap=200)
+    pdf = Path(args.pdf)
+    texts, metadatas = split_pages(iter_pages(pdf.read_bytes()), splitter, source=pdf.name)
+    store = build_vector_store(texts, embeddings, metadatas)
+    questions = read_questions(Path(args.questions).read_text(encoding="utf-8"))
+
+    start = time.perf_counter()
+    results = answer_batch(questions, store, embeddings, pipe, k=args.k, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    out = Path(args.out)
+    out.write_text(to_csv(results) if out.suffix == ".csv" else to_jsonl(results), encoding="utf-8")
+    print(f"{len(results)} questions in {elapsed:.1f} s ({len(results) / max(elapsed, 1e-9):.1f} questions/s) -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Recall@k vs. latency of the ann_index types against exact flat search on a synthetic corpus.
+
+Run: python bench_ann.py [n_vectors] [dim]
+"""
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from ann_index import INDEX_TYPES, build_index
+
+
+def synthetic_corpus(n: int, d: int, n_queries: int = 500, clusters: int = 200, seed: int = 0):
+    """Clustered unit vectors (embeddings are far from uniform) plus queries drawn near them."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, d)).astype(np.float32)
+    xb = centers[rng.integers(clusters, size=n)] + 0.6 * rng.standard_normal((n, d)).astype(np.float32)
+    xq = xb[rng.integers(n, size=n_queries)] + 0.3 * rng.standard_normal((n_queries, d)).astype(np.float32)
+    xb /= np.linalg.norm(xb, axis=1, keepdims=True)
+    xq /= np.linalg.norm(xq, axis=1, keepdims=True)
+    return xb, xq
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def measure(index, xq: np.ndarray, truth: np.ndarray, k: int):
+    start = time.perf_counter()
+    for q in xq:  # one query at a time, like the app
+        index.search(q[None, :], k)
+    per_query = (time.perf_counter() - start) / len(xq)
+    _, found = index.search(xq, k)
+    return recall_at_k(found, truth), per_query * 1e3
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    d = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    k = 3
+    xb, xq = synthetic_corpus(n, d)
+    exact = build_index(xb, "flat")
+    _, truth = exact.search(xq, k)
+    print(f"{n:,} vectors x {d} dims, {len(xq)} queries, recall@{k} vs. flat")
+    print(f"  {'index':<10}{'setting':<14}{'recall':>8}{'ms/query':>10}{'build s':>9}{'MB':>8}")
+    for kind in INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_index(xb, kind)
+        built = time.perf_counter() - start
+        mb = faiss.serialize_index(index).nbytes / 1e6
+        if kind == "hnsw":
+            settings = [("efSearch", v) for v in (16, 32, 64, 128)]
+        elif kind.startswith("ivf"):
+            settings = [("nprobe", v) for v in (1, 4, 16, 64) if v <= index.nlist]
+        else:
+            settings = [("-", None)]
+        for name, value in settings:
+            if name == "efSearch":
+                index.hnsw.efSearch = value
+            elif name == "nprobe":
+                index.nprobe = value
+            recall, ms = measure(index, xq, truth, k)
+            setting = f"{name}={value}" if value is not None else ""
+            print(f"  {kind:<10}{setting:<14}{recall:>8.3f}{ms:>10.3f}{built:>9.1f}{mb:>8.1f}")
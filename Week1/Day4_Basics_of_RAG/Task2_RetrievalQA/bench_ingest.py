@@ -0,0 +1,74 @@
+"""Benchmark PDF text extraction on a synthetic policy manual.
+
+Run: python bench_ingest.py [pages] [processes]
+"""
+import io
+import random
+import sys
+import time
+
+import PyPDF2
+
+from pdf_ingest import iter_pages
+
+WORDS = ("refund policy customer order days return item receipt store credit manager approval "
+         "shipping damaged exchange warranty invoice payment period request eligible").split()
+
+
+def synthetic_pdf(pages: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """A valid PDF with ``pages`` pages of random policy-like text (Helvetica, no dependencies)."""
+    rnd = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        lines = [f"Section {p + 1}.{i + 1}: " + " ".join(rnd.choices(WORDS, k=10)) for i in range(lines_per_page)]
+        body = "BT /F1 10 Tf 14 TL 40 800 Td " + " ".join(f"({ln}) '" for ln in lines) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (i, obj))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % off for off in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def serial_concat(data: bytes) -> str:
+    """The original RetrievalQA_A3.py loop."""
+    full_text = ""
+    for page in PyPDF2.PdfReader(io.BytesIO(data)).pages:
+        text = page.extract_text()
+        if text:
+            full_text += text + "\n"
+    return full_text
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 800
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    data = synthetic_pdf(pages)
+    print(f"synthetic PDF: {pages} pages, {len(data) / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    baseline = serial_concat(data)
+    serial = time.perf_counter() - start
+    print(f"  serial concat          {serial:6.2f} s")
+
+    for procs in (1, processes):
+        start = time.perf_counter()
+        parallel = "".join(text + "\n" for _, text in iter_pages(data, processes=procs))
+        elapsed = time.perf_counter() - start
+        label = f"iter_pages({procs or 'cpu_count'})"
+        print(f"  {label:<22} {elapsed:6.2f} s  x{serial / elapsed:.1f}  same text: {parallel == baseline}")
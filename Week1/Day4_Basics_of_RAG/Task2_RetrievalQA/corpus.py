@@ -0,0 +1,189 @@
+"""Corpus mode for RetrievalQA_A3.py: many PDFs behind one search.
+
+Each document is a shard, a ``faiss_index_<md5>`` store like the one single-document
+mode writes, kept under the corpus's own ``root`` directory and listed in a JSON
+manifest. Questions fan out over the shards that pass the metadata filter and the hits
+are merged by distance. ``compact()`` folds every shard into one store (vectors come back
+from the embedding cache, nothing is re-embedded); the shards are kept, since searches
+limited to some documents still run on them. ``gc()`` deletes ``faiss_index_*``
+directories under ``root`` that the manifest no longer references.
+
+Adding a PDF under a source name already in the corpus replaces that document. One
+``Corpus`` is shared by every session, so manifest changes are made under a lock.
+"""
+import hashlib
+import heapq
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain.vectorstores import FAISS
+
+from ann_index import build_vector_store
+from pdf_ingest import iter_pages, split_pages
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+class Corpus:
+    def __init__(self, embeddings, stores, root: str = "corpus", name: str = "corpus", kind: str = "auto"):
+        self.embeddings = embeddings
+        self.stores = stores  # a qa_cache.VectorStoreLRU, shared with single-document mode
+        self.root = Path(root)  # only the corpus writes here, so gc() cannot touch other indexes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.kind = kind
+        self.manifest_path = self.root / f"{name}.json"
+        self._lock = threading.Lock()  # guards self.manifest, its file and self._building
+        self._building = set()  # shard directories being written, which gc() must leave alone
+        self.manifest = {"docs": {}, "compacted": None}
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    @property
+    def docs(self) -> Dict[str, dict]:
+        """A copy of the manifest's documents, safe to iterate while other sessions add."""
+        return self._snapshot()[0]
+
+    def _save(self):
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=1), encoding="utf-8")
+        tmp.replace(self.manifest_path)
+
+    def _load(self, dirname: str) -> FAISS:
+        path = self.root / dirname
+        return self.stores.get_or_build(
+            str(path), lambda: FAISS.load_local(str(path), self.embeddings, allow_dangerous_deserialization=True))[0]
+
+    def _snapshot(self) -> Tuple[Dict[str, dict], Optional[str]]:
+        with self._lock:
+            return dict(self.manifest["docs"]), self.manifest.get("compacted")
+
+    def add(self, data: bytes, source: str, splitter) -> Tuple[str, bool]:
+        """Add a PDF as a shard; returns its hash and whether it was new to the corpus.
+
+        An earlier document with the same ``source`` is replaced and its shard deleted.
+        """
+        doc_hash = hashlib.md5(data).hexdigest()
+        dirname = f"faiss_index_{doc_hash}"
+        with self._lock:
+            if doc_hash in self.manifest["docs"]:
+                return doc_hash, False
+            self._building.add(dirname)
+        try:
+            texts, metadatas = split_pages(iter_pages(data), splitter, source=source)
+            if not (self.root / dirname).exists():
+                # built outside the lock so other sessions' searches are not held up by embedding
+                store = build_vector_store(texts, self.embeddings, metadatas, kind=self.kind)
+                store.save_local(str(self.root / dirname))
+            with self._lock:
+                docs = self.manifest["docs"]
+                if doc_hash in docs:  # another session added it meanwhile
+                    return doc_hash, False
+                replaced = [docs.pop(h)["dir"] for h, info in list(docs.items()) if info["source"] == source]
+                docs[doc_hash] = {"source": source, "dir": dirname, "chunks": len(texts),
+                                  "pages": max((m["page"] for m in metadatas), default=0), "added": time.time()}
+                self._save()
+        finally:
+            with self._lock:
+                self._building.discard(dirname)
+        for old in replaced:
+            shutil.rmtree(self.root / old, ignore_errors=True)
+        return doc_hash, True
+
+    def remove(self, doc_hash: str):
+        """Drop a document from the corpus; its directory goes at the next ``gc()``."""
+        with self._lock:
+            if self.manifest["docs"].pop(doc_hash, None) is not None:
+                self._save()
+
+    def _compacted_dir(self, doc_hashes: Iterable[str]) -> str:
+        key = hashlib.md5(" ".join(sorted(doc_hashes)).encode()).hexdigest()
+        return f"faiss_index_corpus_{key}"
+
+    def compact(self) -> str:
+        """Merge all shards into one store so unfiltered questions search a single index.
+
+        The shards stay on disk (source-filtered searches use them); the previous merged
+        store is deleted once the new one is saved.
+        """
+        docs, _ = self._snapshot()
+        texts, metadatas = [], []
+        for info in docs.values():
+            store = self._load(info["dir"])
+            for doc in store.docstore._dict.values():
+                texts.append(doc.page_content)
+                metadatas.append(doc.metadata)
+        dirname = self._compacted_dir(docs)
+        with self._lock:
+            self._building.add(dirname)
+        try:
+            if texts and not (self.root / dirname).exists():
+                # embeddings are assumed to be a CachedEmbeddings, so these are all cache hits
+                store = build_vector_store(texts, self.embeddings, metadatas, kind=self.kind)
+                store.save_local(str(self.root / dirname))
+            current = dirname if texts else None
+            with self._lock:
+                previous = self.manifest.get("compacted")
+                self.manifest["compacted"] = current
+                self._save()
+        finally:
+            with self._lock:
+                self._building.discard(dirname)
+        if previous and previous != current:
+            shutil.rmtree(self.root / previous, ignore_errors=True)
+        return dirname
+
+    def search(self, query: str, k: int = 3, sources: Optional[Iterable[str]] = None,
+               pages: Optional[Tuple[int, int]] = None) -> List:
+        """Top ``k`` chunks across the corpus, optionally limited to ``sources`` and a page range.
+
+        A source filter searches only those documents' shards; a page filter makes each
+        searched index rank all of its vectors, so matching pages are never crowded out.
+        """
+        sources = set(sources) if sources is not None else None
+        where = {}
+        if sources is not None:
+            where["source"] = sorted(sources)
+        if pages is not None:
+            where["page"] = list(range(pages[0], pages[1] + 1))
+        qvec = self.embeddings.embed_query(query)
+        docs, compacted = self._snapshot()
+        if sources is None and compacted == self._compacted_dir(docs) and (self.root / compacted).exists():
+            shards = [compacted]
+        else:
+            shards = [info["dir"] for info in docs.values() if sources is None or info["source"] in sources]
+        hits = []
+        for dirname in shards:
+            try:
+                store = self._load(dirname)
+            except (RuntimeError, OSError):
+                if (self.root / dirname).exists():
+                    raise
+                continue  # replaced or collected by another session since the snapshot
+            fetch_k = store.index.ntotal if pages is not None else max(20, 4 * k)
+            hits.extend(store.similarity_search_with_score_by_vector(
+                qvec, k=k, filter=where or None, fetch_k=fetch_k))
+        return [doc for doc, _ in heapq.nsmallest(k, hits, key=lambda h: h[1])]
+
+    def gc(self, max_age: float = 7 * 24 * 3600) -> int:
+        """Delete unreferenced ``faiss_index_*`` directories untouched for ``max_age`` seconds; bytes freed."""
+        with self._lock:  # one look at the manifest, so a shard added meanwhile is either listed or building
+            keep = {info["dir"] for info in self.manifest["docs"].values()} | self._building
+            if self.manifest.get("compacted") == self._compacted_dir(self.manifest["docs"]):
+                keep.add(self.manifest["compacted"])
+        freed = 0
+        now = time.time()
+        for path in self.root.glob("faiss_index_*"):
+            if path.name in keep or not path.is_dir() or now - path.stat().st_mtime < max_age:
+                continue
+            freed += _dir_bytes(path)
+            shutil.rmtree(path, ignore_errors=True)
+        return freed
+
+    def disk_bytes(self) -> int:
+        return sum(_dir_bytes(p) for p in self.root.glob("faiss_index_*") if p.is_dir())
@@ -0,0 +1,73 @@
+"""Chunk-level embedding cache for RetrievalQA_A3.py.
+
+Vectors are stored in SQLite under sha256(model name + chunk text), so re-uploading an
+edited PDF only embeds the chunks that actually changed.
+"""
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, List
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings model; ``embed_documents`` only runs the model on cache misses.
+
+    ``hits``/``misses`` are running totals, ``last_hits``/``last_misses`` cover the latest
+    ``embed_documents`` call. Queries are embedded directly (they rarely repeat), one at a
+    time with ``embed_query`` or in a batch with ``embed_queries``; they are never stored.
+    """
+
+    def __init__(self, inner: Embeddings, model_name: str, path: str = "embedding_cache.sqlite"):
+        self.inner = inner
+        self.model_name = model_name
+        self.hits = self.misses = self.last_hits = self.last_misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique), 500):  # stay under SQLite's bound-parameter limit
+                part = unique[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(part))})", part)
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(t) for t in texts]
+        found = self._lookup(keys)
+        todo = {k: t for k, t in zip(keys, texts) if k not in found}
+        if todo:
+            vectors = self.inner.embed_documents(list(todo.values()))
+            rows = [(k, np.asarray(v, dtype=np.float32).tobytes()) for k, v in zip(todo, vectors)]
+            with self._lock, self._db:
+                self._db.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?)", rows)
+            found.update((k, np.frombuffer(blob, dtype=np.float32).tolist()) for k, blob in rows)
+        self.last_misses = sum(k in todo for k in keys)
+        self.last_hits = len(keys) - self.last_misses
+        self.hits += self.last_hits
+        self.misses += self.last_misses
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries in one model call, bypassing the cache and its hit/miss counts."""
+        return self.inner.embed_documents(texts)
+
+    @property
+    def last_hit_rate(self) -> float:
+        total = self.last_hits + self.last_misses
+        return self.last_hits / total if total else 0.0
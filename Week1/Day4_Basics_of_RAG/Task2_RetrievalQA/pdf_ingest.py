@@ -0,0 +1,67 @@
+"""Page-level PDF text extraction for RetrievalQA_A3.py.
+
+Pages are extracted in parallel (each worker parses the PDF once and handles a run of
+pages), yielded in page order as ``(page_no, text)`` and split page by page, so every
+chunk knows which page it came from.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import PyPDF2
+
+_WORKER_READER = None
+
+
+def _init_worker(data: bytes):
+    global _WORKER_READER
+    _WORKER_READER = PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def _extract_range(bounds: Tuple[int, int]) -> List[Tuple[int, str]]:
+    start, stop = bounds
+    return [(i + 1, _WORKER_READER.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def page_count(data: bytes) -> int:
+    return len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+
+
+def iter_pages(data: bytes, processes: Optional[int] = None, pages_per_task: int = 16) -> Iterator[Tuple[int, str]]:
+    """Yield ``(page_no, text)`` for every non-empty page, 1-based and in page order.
+
+    ``processes`` defaults to the CPU count; documents shorter than two tasks, or
+    ``processes=1``, are extracted in this process.
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    n = len(reader.pages)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or n <= pages_per_task:
+        for i, page in enumerate(reader.pages):
+            text = page.extract_text()
+            if text:
+                yield i + 1, text
+        return
+    ranges = [(i, min(i + pages_per_task, n)) for i in range(0, n, pages_per_task)]
+    with ProcessPoolExecutor(min(processes, len(ranges)), initializer=_init_worker, initargs=(data,)) as pool:
+        for batch in pool.map(_extract_range, ranges):
+            for page_no, text in batch:
+                if text:
+                    yield page_no, text
+
+
+def split_pages(pages: Iterable[Tuple[int, str]], splitter, source: str = "") -> Tuple[List[str], List[dict]]:
+    """Chunk texts plus ``{"source", "page"}`` metadata, one splitter pass per page."""
+    texts, metadatas = [], []
+    for page_no, text in pages:
+        for chunk in splitter.split_text(text):
+            texts.append(chunk)
+            metadatas.append({"source": source, "page": page_no})
+    return texts, metadatas
+
+
+def cite_pages(documents) -> str:
+    """'p. 3, 7' for the pages of the retrieved documents, in order of first appearance."""
+    pages = dict.fromkeys(d.metadata["page"] for d in documents if "page" in d.metadata)
+    return ("p. " + ", ".join(str(p) for p in pages)) if pages else ""
@@ -0,0 +1,101 @@
+"""Process-wide helpers for RetrievalQA_A3.py: a memory-bounded vector-store LRU and stage timings."""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+
+import faiss
+
+
+def store_bytes(vector_store) -> int:
+    """Approximate RAM held by a LangChain FAISS store: serialized index plus chunk texts."""
+    index_bytes = faiss.serialize_index(vector_store.index).nbytes
+    docs = getattr(vector_store.docstore, "_dict", {}).values()
+    return index_bytes + sum(len(d.page_content) for d in docs)
+
+
+class VectorStoreLRU:
+    """Vector stores by document hash, least-recently-used first out once over ``max_bytes``.
+
+    The most recent store is always kept, even if it alone exceeds the budget. Concurrent
+    requests for a key that is being built wait for that one build instead of starting
+    their own (two sessions uploading the same PDF embed and save it once).
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._stores: "OrderedDict[str, Tuple[object, int]]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: str, build: Callable[[], object]) -> Tuple[object, bool]:
+        """The store for ``key`` and whether it was already in memory."""
+        with self._lock:
+            if key in self._stores:
+                self._stores.move_to_end(key)
+                return self._stores[key][0], True
+            fut = self._pending.get(key)
+            owner = fut is None
+            if owner:
+                fut = self._pending[key] = Future()
+        if not owner:
+            return fut.result(), True  # built by another session; re-raises its error
+        try:
+            store = build()  # outside the lock: other documents stay servable meanwhile
+            size = store_bytes(store)
+        except BaseException as exc:
+            with self._lock:
+                self._pending.pop(key, None)
+            fut.set_exception(exc)
+            raise
+        with self._lock:
+            self._stores[key] = (store, size)
+            self._stores.move_to_end(key)
+            while len(self._stores) > 1 and self.total_bytes > self.max_bytes:
+                self._stores.popitem(last=False)
+            self._pending.pop(key, None)
+        fut.set_result(store)
+        return store, False
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for _, size in self._stores.values())
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+
+class StageTimings:
+    """Wall-clock seconds per named stage, accumulated across ``with timings.stage(name)`` blocks."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def timed_iter(self, name: str, items: Iterable) -> Iterator:
+        """Yield from ``items``, charging only the time spent producing them to ``name``."""
+        it = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add(name, time.perf_counter() - start)
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+
+    def summary(self) -> str:
+        return " · ".join(f"{name} {s * 1e3:,.0f} ms" for name, s in self.seconds.items())
@@ -1,52 +1,444 @@
 
 # agents.py
 from __future__ import annotations
-import math, re
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+import heapq, json, math, re, sys, threading, time
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+try:  # optional: only SparseTfidf needs NumPy (SciPy just makes it faster)
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+from dense import DenseRetriever, reciprocal_rank_fusion
 
 WORD = re.compile(r"[A-Za-z][A-Za-z\-']+")
+LOWER_WORD = re.compile(r"[a-z][a-z\-']+")
 
 def tokenize(text: str) -> List[str]:
-    return [w.lower() for w in WORD.findall(text)]
+    # Non-ASCII characters are never part of a WORD, so mapping them to '?' changes no
+    # token boundary and lets the whole text be lower-cased once with ASCII semantics;
+    # one regex pass then yields the final tokens (same as lower-casing each WORD match).
+    if not text.isascii():
+        text = text.encode("ascii", "replace").decode("ascii")
+    return LOWER_WORD.findall(text.lower())
+
+def term_counts(tokens: Sequence[str]) -> Dict[str, int]:
+    """Term frequencies in first-seen order, with interned keys shared across documents."""
+    return {sys.intern(t): c for t, c in Counter(tokens).items()}
+
+@lru_cache(maxsize=4096)
+def _query_tokens(text: str) -> Tuple[str, ...]:
+    return tuple(tokenize(text))
+
+def candidate_lines(text: str) -> List[str]:
+    """Answer-candidate lines of a document: non-empty and not header-like (ending in ':')."""
+    return [ln.strip() for ln in text.splitlines() if ln.strip() and not ln.endswith(":")]
 
 @dataclass
 class Document:
     doc_id: str
     text: str
 
+@dataclass
+class QueryContext:
+    """A query tokenized once per request; each index caches its encoded vector here."""
+    text: str
+    tokens: List[str]
+    tf: Dict[str, int]
+    vectors: Dict[Tuple, Dict[str, float]] = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, query: Union[str, "QueryContext"]) -> "QueryContext":
+        if isinstance(query, QueryContext):
+            return query
+        # short questions repeat a lot (sidebar buttons, replays), so their tokens are memoised
+        toks = list(_query_tokens(query)) if len(query) <= 512 else tokenize(query)
+        return cls(query, toks, term_counts(toks))
+
+class _MappedPostings(Mapping):
+    """Read-only term -> {doc_id: weight} view over memory-mapped posting arrays."""
+    def __init__(self, term_ids: Dict[str, int], doc_ids: List[str], arrays: Dict[str, "np.ndarray"]):
+        self.term_ids, self.doc_ids, self.arrays = term_ids, doc_ids, arrays
+
+    def __getitem__(self, t: str) -> Dict[str, float]:
+        i = self.term_ids[t]
+        a, b = int(self.arrays["ptr"][i]), int(self.arrays["ptr"][i + 1])
+        rows = self.arrays["rows"][a:b].tolist()
+        return dict(zip([self.doc_ids[r] for r in rows], self.arrays["weights"][a:b].tolist()))
+
+    def __contains__(self, t) -> bool:
+        return t in self.term_ids
+
+    def __iter__(self):
+        return iter(self.term_ids)
+
+    def __len__(self) -> int:
+        return len(self.term_ids)
+
+class _MappedLinePostings(_MappedPostings):
+    """Read-only term -> {doc_id: [(line_no, weight)]} view over the line arrays."""
+    def __getitem__(self, t: str) -> Dict[str, List[Tuple[int, float]]]:
+        i = self.term_ids[t]
+        a, b = int(self.arrays["lptr"][i]), int(self.arrays["lptr"][i + 1])
+        out: Dict[str, List[Tuple[int, float]]] = {}
+        for r, n, w in zip(self.arrays["lrows"][a:b].tolist(), self.arrays["lnos"][a:b].tolist(),
+                           self.arrays["lweights"][a:b].tolist()):
+            out.setdefault(self.doc_ids[r], []).append((n, w))
+        return out
+
+class _MappedVectors(Mapping):
+    """Read-only doc_id -> {term: weight} view; the forward index is derived on first use."""
+    def __init__(self, vocab: List[str], ords: Dict[str, int], arrays: Dict[str, "np.ndarray"]):
+        self.vocab, self.ords, self.arrays = vocab, ords, arrays
+        self._fwd = None
+
+    def __getitem__(self, doc_id: str) -> Dict[str, float]:
+        if self._fwd is None:
+            ptr, rows = self.arrays["ptr"], self.arrays["rows"]
+            order = np.argsort(rows, kind="stable")
+            terms = np.repeat(np.arange(len(self.vocab)), np.diff(ptr))[order]
+            fptr = np.searchsorted(rows[order], np.arange(len(self.ords) + 1))
+            self._fwd = (fptr, terms, self.arrays["weights"][order])
+        fptr, terms, weights = self._fwd
+        r = self.ords[doc_id]
+        a, b = int(fptr[r]), int(fptr[r + 1])
+        return dict(zip([self.vocab[i] for i in terms[a:b].tolist()], weights[a:b].tolist()))
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self.ords
+
+    def __iter__(self):
+        return iter(self.ords)
+
+    def __len__(self) -> int:
+        return len(self.ords)
+
 class MiniTfidf:
-    def __init__(self, docs: List[Document]):
-        self.docs = docs
+    """Inverted TF-IDF index over a list of documents.
+
+    ``scoring`` picks the document ranking model: "tfidf" (augmented TF x IDF, cosine),
+    "bm25" or "bm25+" (``k1``, ``b``, ``delta``), with document-length normalisation
+    folded into the stored weights. Line scoring for answers is always TF-IDF cosine.
+    """
+    SCORINGS = ("tfidf", "bm25", "bm25+")
+
+    def __init__(self, docs: List[Document], reweight_threshold: float = 0.1, scoring: str = "tfidf",
+                 k1: float = 1.2, b: float = 0.75, delta: float = 1.0):
+        if scoring not in self.SCORINGS:
+            raise ValueError(f"unknown scoring {scoring!r}; expected one of {self.SCORINGS}")
+        self.scoring, self.k1, self.b, self.delta = scoring, k1, b, delta
+        self.doc_map: Dict[str, Document] = {}
         self.vocab_idf: Dict[str, float] = {}
+        self.bm25_idf: Dict[str, float] = {}
         self.doc_vectors: Dict[str, Dict[str, float]] = {}
+        # inverted index: term -> {doc_id: weight}, plus per-term max weight for pruning
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.max_weight: Dict[str, float] = {}
+        # answer-candidate lines per document and their own postings: term -> {doc_id: [(line_no, weight)]}
+        self.doc_lines: Dict[str, List[str]] = {}
+        self.line_postings: Dict[str, Dict[str, List[Tuple[int, float]]]] = {}
+        # document frequencies and raw term counts, kept so documents can change in place
+        self.df: Dict[str, int] = {}
+        self.reweight_threshold = reweight_threshold
+        self.version = 0
+        self._tf: Dict[str, Dict[str, int]] = {}
+        self._ord: Dict[str, int] = {}
+        self._next_ord = 0
+        self._drift = 0
+        self._mass = 0
+        self._total_len = 0
+        self._avgdl = 0.0
+        self._mapped = None
+        for d in docs:
+            self._put(d)
         self._build()
-    
+
+    @property
+    def docs(self) -> List[Document]:
+        return list(self.doc_map.values())
+
+    def _idf(self, t: str) -> float:
+        return math.log((len(self.doc_map) + 1) / (self.df[t] + 1)) + 1.0
+
+    def _bm25_idf(self, t: str) -> float:
+        n, df = len(self.doc_map), self.df[t]
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
     def _build(self):
-        N = len(self.docs)
-        df = {}
-        tokenized = {}
-        for d in self.docs:
-            toks = tokenize(d.text)
-            tokenized[d.doc_id] = toks
-            for t in set(toks):
-                df[t] = df.get(t, 0) + 1
-        for t, c in df.items():
-            self.vocab_idf[t] = math.log((N + 1) / (c + 1)) + 1.0
-        for d in self.docs:
-            tf = {}
-            for t in tokenized[d.doc_id]:
-                tf[t] = tf.get(t, 0) + 1
+        """(Re)weight every document against the current df counts."""
+        self._thaw()
+        self.vocab_idf = {t: self._idf(t) for t in self.df}
+        if self.scoring != "tfidf":
+            self.bm25_idf = {t: self._bm25_idf(t) for t in self.df}
+        self._avgdl = self._total_len / max(1, len(self.doc_map))
+        self.doc_vectors, self.postings, self.max_weight = {}, {}, {}
+        self.doc_lines, self.line_postings = {}, {}
+        for doc_id in self.doc_map:
+            self._vectorise(doc_id)
+        self._drift, self._mass = 0, sum(self.df.values())
+        self.version += 1
+
+    def _put(self, d: Document):
+        if d.doc_id in self.doc_map:
+            self._drop_counts(d.doc_id)
+        else:
+            self._ord[d.doc_id] = self._next_ord
+            self._next_ord += 1
+        self.doc_map[d.doc_id] = d
+        self._add_counts(d)
+
+    def _add_counts(self, d: Document):
+        tf = self._tf[d.doc_id] = term_counts(tokenize(d.text))
+        for t in tf:
+            self.df[t] = self.df.get(t, 0) + 1
+        self._total_len += sum(tf.values())
+        self._drift += len(tf) + 1  # +1: N itself moves every IDF
+
+    def _drop_counts(self, doc_id: str):
+        tf = self._tf.pop(doc_id)
+        for t in tf:
+            if self.df[t] > 1:
+                self.df[t] -= 1
+            else:
+                del self.df[t]
+                self.vocab_idf.pop(t, None)
+                self.bm25_idf.pop(t, None)
+            self._drift += 1
+        self._total_len -= sum(tf.values())
+        self._drift += 1
+
+    def _weigh(self, tf: Dict[str, int]) -> Dict[str, float]:
+        if self.scoring == "tfidf":
             max_tf = max(tf.values()) if tf else 1
             vec = {t: (0.5 + 0.5*tf[t]/max_tf) * self.vocab_idf.get(t, 0.0) for t in tf}
             norm = math.sqrt(sum(v*v for v in vec.values())) or 1.0
-            self.doc_vectors[d.doc_id] = {t: v/norm for t, v in vec.items()}
+            return {t: v/norm for t, v in vec.items()}
+        for t in tf:
+            if t not in self.bm25_idf:
+                self.bm25_idf[t] = self._bm25_idf(t)
+        dl = sum(tf.values())
+        k = self.k1 * (1.0 - self.b + self.b * dl / (self._avgdl or dl or 1))
+        extra = self.delta if self.scoring == "bm25+" else 0.0
+        return {t: self.bm25_idf[t] * (c * (self.k1 + 1.0) / (c + k) + extra) for t, c in tf.items()}
+
+    def _vectorise(self, doc_id: str):
+        tf = self._tf[doc_id]
+        for t in tf:
+            if t not in self.vocab_idf:
+                self.vocab_idf[t] = self._idf(t)
+        vec = self.doc_vectors[doc_id] = self._weigh(tf)
+        for t, w in vec.items():
+            self.postings.setdefault(t, {})[doc_id] = w
+            if w > self.max_weight.get(t, 0.0):
+                self.max_weight[t] = w
+        self._index_lines(doc_id)
+
+    def _index_lines(self, doc_id: str):
+        lines = self.doc_lines[doc_id] = candidate_lines(self.doc_map[doc_id].text)
+        for i, ln in enumerate(lines):
+            for t, w in self.encode_query(ln).items():
+                self.line_postings.setdefault(t, {}).setdefault(doc_id, []).append((i, w))
+
+    def _unpost(self, doc_id: str):
+        # max_weight is left as is: a stale bound is still a valid upper bound
+        for t in self.doc_vectors.pop(doc_id):
+            plist = self.postings[t]
+            del plist[doc_id]
+            if not plist:
+                del self.postings[t], self.max_weight[t]
+            lines = self.line_postings.get(t)
+            if lines and lines.pop(doc_id, None) is not None and not lines:
+                del self.line_postings[t]
+        del self.doc_lines[doc_id]
+
+    def _changed(self):
+        if self._drift > self.reweight_threshold * self._mass:
+            self._build()
+        else:
+            self.version += 1
+
+    def add_documents(self, docs: List[Document]):
+        """Add (or replace) documents, touching only their own postings.
+
+        IDF is re-derived lazily: new documents are weighted with the current IDF and a
+        full re-weight only happens once the df changes since the last one exceed
+        ``reweight_threshold`` of the total df mass (0 keeps the index always exact).
+        """
+        self._thaw()
+        for d in docs:
+            if d.doc_id in self.doc_vectors:
+                self._unpost(d.doc_id)
+            self._put(d)
+            self._vectorise(d.doc_id)
+        self._changed()
+
+    def update_document(self, doc: Document):
+        if doc.doc_id not in self.doc_map:
+            raise KeyError(doc.doc_id)
+        self.add_documents([doc])
+
+    def remove_document(self, doc_id: str):
+        if doc_id not in self.doc_map:
+            raise KeyError(doc_id)
+        self._thaw()
+        self._drop_counts(doc_id)
+        self._unpost(doc_id)
+        del self.doc_map[doc_id], self._ord[doc_id]
+        self._changed()
+
+    def reweight(self):
+        self._build()
+
+    _ARRAYS = ("idf", "bidf", "df", "ptr", "rows", "weights", "tf", "lptr", "lrows", "lnos", "lweights")
+
+    def save(self, path: str):
+        """Write the index to directory ``path``: ``.npy`` arrays plus vocab/doc files.
+
+        Postings are stored term-major (``ptr`` offsets into ``rows``/``weights``/``tf``),
+        already normalised, so ``load`` needs no tokenizing or re-weighting.
+        """
+        if np is None:
+            raise ImportError("MiniTfidf.save requires numpy")
+        self._thaw()
+        out = Path(path)
+        out.mkdir(parents=True, exist_ok=True)
+        vocab = list(self.vocab_idf)
+        rows_of = {doc_id: i for i, doc_id in enumerate(self.doc_map)}
+        ptr, rows, weights, tfs = [0], [], [], []
+        for t in vocab:
+            for doc_id, w in self.postings.get(t, {}).items():
+                rows.append(rows_of[doc_id])
+                weights.append(w)
+                tfs.append(self._tf[doc_id][t])
+            ptr.append(len(rows))
+        lptr, lrows, lnos, lweights = [0], [], [], []
+        for t in vocab:
+            for doc_id, entries in self.line_postings.get(t, {}).items():
+                for n, w in entries:
+                    lrows.append(rows_of[doc_id])
+                    lnos.append(n)
+                    lweights.append(w)
+            lptr.append(len(lrows))
+        arrays = {
+            "idf": np.asarray([self.vocab_idf[t] for t in vocab], dtype=np.float64),
+            "bidf": np.asarray([self.bm25_idf.get(t, 0.0) for t in vocab], dtype=np.float64),
+            "df": np.asarray([self.df.get(t, 0) for t in vocab], dtype=np.int32),
+            "ptr": np.asarray(ptr, dtype=np.int64),
+            "rows": np.asarray(rows, dtype=np.int32),
+            "weights": np.asarray(weights, dtype=np.float64),
+            "tf": np.asarray(tfs, dtype=np.int32),
+            "lptr": np.asarray(lptr, dtype=np.int64),
+            "lrows": np.asarray(lrows, dtype=np.int32),
+            "lnos": np.asarray(lnos, dtype=np.int32),
+            "lweights": np.asarray(lweights, dtype=np.float64),
+        }
+        for name, arr in arrays.items():
+            np.save(out / f"{name}.npy", arr)
+        (out / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+        with open(out / "docs.jsonl", "w", encoding="utf-8") as f:
+            for d in self.doc_map.values():
+                f.write(json.dumps({"doc_id": d.doc_id, "text": d.text}) + "\n")
+        meta = {"format": 3, "reweight_threshold": self.reweight_threshold,
+                "drift": self._drift, "mass": self._mass, "avgdl": self._avgdl,
+                "scoring": self.scoring, "k1": self.k1, "b": self.b, "delta": self.delta}
+        (out / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "MiniTfidf":
+        """Open an index written by ``save``; with ``mmap`` the posting arrays stay on disk
+        (shared through the page cache) until the index is modified."""
+        if np is None:
+            raise ImportError("MiniTfidf.load requires numpy")
+        src = Path(path)
+        meta = json.loads((src / "meta.json").read_text(encoding="utf-8"))
+        arrays = {name: np.load(src / f"{name}.npy", mmap_mode="r" if mmap else None) for name in cls._ARRAYS}
+        vocab = (src / "vocab.txt").read_text(encoding="utf-8").splitlines()
+        self = cls.__new__(cls)
+        self.doc_map = {}
+        with open(src / "docs.jsonl", encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                self.doc_map[rec["doc_id"]] = Document(rec["doc_id"], rec["text"])
+        self._ord = {doc_id: i for i, doc_id in enumerate(self.doc_map)}
+        self._next_ord = len(self._ord)
+        self.vocab_idf = dict(zip(vocab, arrays["idf"].tolist()))
+        self.df = dict(zip(vocab, arrays["df"].tolist()))
+        term_ids = {t: i for i, t in enumerate(vocab)}
+        self.postings = _MappedPostings(term_ids, list(self.doc_map), arrays)
+        self.line_postings = _MappedLinePostings(term_ids, list(self.doc_map), arrays)
+        self.doc_lines = {doc_id: candidate_lines(d.text) for doc_id, d in self.doc_map.items()}
+        self.doc_vectors = _MappedVectors(vocab, self._ord, arrays)
+        self.max_weight = {}
+        if len(arrays["rows"]):
+            self.max_weight = dict(zip(vocab, np.maximum.reduceat(arrays["weights"], arrays["ptr"][:-1]).tolist()))
+        self.reweight_threshold = meta["reweight_threshold"]
+        self._drift, self._mass, self._avgdl = meta["drift"], meta["mass"], meta["avgdl"]
+        self.scoring, self.k1, self.b, self.delta = meta["scoring"], meta["k1"], meta["b"], meta["delta"]
+        self.bm25_idf = dict(zip(vocab, arrays["bidf"].tolist())) if self.scoring != "tfidf" else {}
+        self._total_len = int(arrays["tf"].sum())
+        self.version = 1
+        self._tf = {}
+        self._mapped = (vocab, arrays)
+        return self
+
+    def _thaw(self):
+        """Copy a memory-mapped index into the in-memory dicts before it is modified."""
+        if self._mapped is None:
+            return
+        vocab, arrays = self._mapped
+        doc_ids = list(self.doc_map)
+        self._tf = {doc_id: {} for doc_id in doc_ids}
+        self.doc_vectors = {doc_id: {} for doc_id in doc_ids}
+        self.postings = {}
+        ptr = arrays["ptr"].tolist()
+        rows, weights, tfs = arrays["rows"].tolist(), arrays["weights"].tolist(), arrays["tf"].tolist()
+        for i, t in enumerate(vocab):
+            plist = self.postings[t] = {}
+            for j in range(ptr[i], ptr[i + 1]):
+                doc_id = doc_ids[rows[j]]
+                plist[doc_id] = self.doc_vectors[doc_id][t] = weights[j]
+                self._tf[doc_id][t] = tfs[j]
+        self.line_postings = {}
+        lptr = arrays["lptr"].tolist()
+        lrows, lnos, lweights = arrays["lrows"].tolist(), arrays["lnos"].tolist(), arrays["lweights"].tolist()
+        for i, t in enumerate(vocab):
+            for j in range(lptr[i], lptr[i + 1]):
+                entries = self.line_postings.setdefault(t, {}).setdefault(doc_ids[lrows[j]], [])
+                entries.append((lnos[j], lweights[j]))
+        self._mapped = None
     
-    def encode_query(self, q: str) -> Dict[str, float]:
-        tf = {}
-        toks = tokenize(q)
-        for t in toks:
-            tf[t] = tf.get(t, 0) + 1
+    def query_vector(self, q: Union[str, QueryContext]) -> Dict[str, float]:
+        """Query weights for ranking documents: ``encode_query`` under TF-IDF, raw query
+        term counts under BM25."""
+        if self.scoring == "tfidf":
+            return self.encode_query(q)
+        ctx = QueryContext.of(q)
+        key = (id(self), self.version, self.scoring)
+        vec = ctx.vectors.get(key)
+        if vec is None:
+            vec = ctx.vectors[key] = {t: float(c) for t, c in ctx.tf.items() if t in self.df}
+        return vec
+
+    def encode_query(self, q: Union[str, QueryContext]) -> Dict[str, float]:
+        if isinstance(q, QueryContext):
+            key = (id(self), self.version)
+            vec = q.vectors.get(key)
+            if vec is None:
+                vec = q.vectors[key] = self._weigh_query(q.tf)
+            return vec
+        return self._weigh_query(term_counts(tokenize(q)))
+
+    def _weigh_query(self, tf: Dict[str, int]) -> Dict[str, float]:
         if not tf:
             return {}
         max_tf = max(tf.values())
@@ -61,63 +453,475 @@ class MiniTfidf:
             qvec, dvec = dvec, qvec
         return sum(qvec.get(t,0.0)*dvec.get(t,0.0) for t in qvec.keys())
     
-    def search(self, query: str, topk: int = 3) -> List[Tuple[str, float]]:
-        qvec = self.encode_query(query)
-        scores = []
-        for doc_id, dvec in self.doc_vectors.items():
-            s = self.cosine(qvec, dvec)
-            scores.append((doc_id, s))
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:topk]
+    def search(self, query: Union[str, QueryContext], topk: int = 3, prune: bool = True) -> List[Tuple[str, float]]:
+        """Term-at-a-time scoring over the posting lists of the query terms.
+
+        With ``prune`` the terms are visited by decreasing upper bound and, once the
+        remaining bound can no longer beat the current k-th score, later terms only
+        update existing candidates (MaxScore-style). Rankings are identical either way.
+        """
+        return self._search(self.query_vector(query), topk, prune, self.postings)
+
+    def search_batch(self, queries: Sequence[Union[str, QueryContext]], topk: int = 3,
+                     prune: bool = True) -> List[List[Tuple[str, float]]]:
+        """``search`` for many queries; each distinct term's posting list is fetched once."""
+        qvecs = [self.query_vector(q) for q in queries]
+        terms = {t for qvec in qvecs for t in qvec}
+        postings = {t: self.postings[t] for t in terms if t in self.postings}
+        return [self._search(qvec, topk, prune, postings) for qvec in qvecs]
+
+    def _search(self, qvec: Dict[str, float], topk: int, prune: bool,
+                postings: Mapping) -> List[Tuple[str, float]]:
+        terms = [t for t in qvec if t in postings]
+        if prune:
+            terms.sort(key=lambda t: qvec[t] * self.max_weight[t], reverse=True)
+        bounds = [qvec[t] * self.max_weight[t] for t in terms]
+        acc: Dict[str, float] = {}
+        for i, t in enumerate(terms):
+            qw = qvec[t]
+            if prune and len(acc) >= topk > 0 and sum(bounds[i:]) < heapq.nlargest(topk, acc.values())[-1]:
+                for doc_id, w in postings[t].items():
+                    if doc_id in acc:
+                        acc[doc_id] += qw * w
+            else:
+                for doc_id, w in postings[t].items():
+                    acc[doc_id] = acc.get(doc_id, 0.0) + qw * w
+        hits = heapq.nlargest(topk, acc.items(), key=lambda x: (x[1], -self._ord[x[0]]))
+        # keep the old contract of always returning min(topk, N) hits, zero scores last in doc order
+        for doc_id in self.doc_map:
+            if len(hits) >= topk:
+                break
+            if doc_id not in acc:
+                hits.append((doc_id, 0.0))
+        return hits
+
+    def rank_lines(self, qvec: Dict[str, float], doc_ids: Sequence[str],
+                   limit: Optional[int] = None) -> List[Tuple[Tuple[str, int], float]]:
+        """Candidate lines of ``doc_ids`` as ``((doc_id, line_no), score)``, best first.
+
+        Scores come from the pre-built line postings, so only lines sharing a term with
+        the query are touched. Ties go to the earlier document, then the earlier line.
+        """
+        rank = {doc_id: r for r, doc_id in enumerate(doc_ids)}
+        acc: Dict[Tuple[int, int], float] = {}
+        for t, qw in qvec.items():
+            plist = self.line_postings.get(t)
+            if not plist:
+                continue
+            for doc_id, r in rank.items():
+                for n, w in plist.get(doc_id, ()):
+                    acc[(r, n)] = acc.get((r, n), 0.0) + qw * w
+        order = lambda x: (-x[1], x[0])
+        ranked = sorted(acc.items(), key=order) if limit is None else heapq.nsmallest(limit, acc.items(), key=order)
+        return [((doc_ids[r], n), score) for (r, n), score in ranked if score > 0.0]
+
+    def best_line(self, qvec: Dict[str, float], doc_ids: Sequence[str]) -> Tuple[str, float]:
+        """Best-scoring candidate line of ``doc_ids`` for an encoded query, or ``("", 0.0)``."""
+        top = self.rank_lines(qvec, doc_ids, 1)
+        if not top:
+            return "", 0.0
+        (doc_id, n), score = top[0]
+        return self.doc_lines[doc_id][n], score
+
+class SparseTfidf(MiniTfidf):
+    """MiniTfidf whose document vectors are also packed into a float32 CSR matrix.
+
+    Queries are scored with one sparse mat-vec (or mat-mat for ``search_batch``) and
+    an ``argpartition`` top-k. The few candidates near the k-th score are re-scored
+    with the exact dict vectors, so rankings match ``MiniTfidf.search``. The matrix is
+    re-packed on the first query after the index changes.
+    """
+    EPS = 1e-4  # float32 slack when picking candidates for exact re-scoring
+    _packed = -1
+
+    def __init__(self, docs: List[Document], reweight_threshold: float = 0.1, **scoring):
+        if np is None:
+            raise ImportError("SparseTfidf requires numpy")
+        super().__init__(docs, reweight_threshold, **scoring)
+        self._pack()
+
+    def _pack(self):
+        self.term_ids: Dict[str, int] = {t: i for i, t in enumerate(self.vocab_idf)}
+        self._rows = list(self.doc_map)
+        indptr, indices, data = [0], [], []
+        for doc_id in self._rows:
+            vec = self.doc_vectors[doc_id]
+            indices.extend(self.term_ids[t] for t in vec)
+            data.extend(vec.values())
+            indptr.append(len(indices))
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.float32)
+        self.matrix = None
+        if sparse is not None:
+            self.matrix = sparse.csr_matrix((self.data, self.indices, self.indptr),
+                                            shape=(len(self._rows), len(self.term_ids)))
+        self._packed = self.version
+
+    def _query_matrix(self, qvecs: Sequence[Dict[str, float]]):
+        rows, cols, vals = [], [], []
+        for j, qvec in enumerate(qvecs):
+            for t, w in qvec.items():
+                i = self.term_ids.get(t)
+                if i is not None:
+                    rows.append(i)
+                    cols.append(j)
+                    vals.append(w)
+        shape = (len(self.term_ids), len(qvecs))
+        if sparse is not None:
+            return sparse.csc_matrix((np.asarray(vals, dtype=np.float32), (rows, cols)), shape=shape)
+        Q = np.zeros(shape, dtype=np.float32)
+        Q[rows, cols] = vals
+        return Q
+
+    def _scores(self, Q) -> "np.ndarray":
+        if self.matrix is not None:
+            return (self.matrix @ Q).toarray()
+        out = np.zeros((len(self._rows), Q.shape[1]), dtype=np.float32)
+        if len(self.data):
+            rows = np.repeat(np.arange(len(self._rows)), np.diff(self.indptr))
+            np.add.at(out, rows, self.data[:, None] * Q[self.indices])
+        return out
+
+    def _topk(self, qvec: Dict[str, float], scores: "np.ndarray", topk: int) -> List[Tuple[str, float]]:
+        k = min(topk, len(self._rows))
+        if k <= 0:
+            return []
+        positive = np.flatnonzero(scores > 0)
+        if len(positive) > k:
+            part = positive[np.argpartition(-scores[positive], k - 1)[:k]]
+            positive = positive[scores[positive] >= scores[part].min() - self.EPS]
+        exact = [(int(pos), self.cosine(qvec, self.doc_vectors[self._rows[pos]])) for pos in positive]
+        exact.sort(key=lambda x: (-x[1], x[0]))
+        hits = [(self._rows[pos], s) for pos, s in exact[:k]]
+        if len(hits) < k:
+            zeros = np.flatnonzero(scores <= 0)[:k - len(hits)]
+            hits.extend((self._rows[pos], 0.0) for pos in zeros)
+        return hits
+
+    def search(self, query: Union[str, QueryContext], topk: int = 3, prune: bool = True) -> List[Tuple[str, float]]:
+        return self.search_batch([query], topk)[0]
+
+    def search_batch(self, queries: Sequence[Union[str, QueryContext]], topk: int = 3,
+                     prune: bool = True) -> List[List[Tuple[str, float]]]:
+        if self._packed != self.version:
+            self._pack()
+        qvecs = [self.query_vector(q) for q in queries]
+        scores = self._scores(self._query_matrix(qvecs))
+        return [self._topk(qvec, scores[:, j], topk) for j, qvec in enumerate(qvecs)]
 
 @dataclass
 class AgentResult:
     answer: str
     agent_name: str
 
+NO_ANSWER = "Sorry, I couldn't find a direct answer."
+
 class BaseAgent:
-    def __init__(self, name: str, index: MiniTfidf, keywords: List[str]):
+    """Answers with the best candidate line of its top documents.
+
+    With a ``dense`` retriever (see dense.py) the lexical line ranking is fused with the
+    dense one by reciprocal-rank fusion, so paraphrases ("take-home pay" for "net
+    salary") can still find their line; an unavailable retriever leaves answers lexical.
+    """
+    def __init__(self, name: str, index: MiniTfidf, keywords: List[str], dense=None, fusion_depth: int = 10):
         self.name = name
         self.index = index
         self.keywords = [t.lower() for t in keywords]
+        self.dense = dense
+        self.fusion_depth = fusion_depth
 
-    def run(self, query: str) -> AgentResult:
-        hits = self.index.search(query, topk=3)
-        best_line, best_score = "", 0.0
-        qvec = self.index.encode_query(query)
-        for doc_id, _ in hits:
-            text = next(d.text for d in self.index.docs if d.doc_id == doc_id)
-            # split into lines & ignore empty or header-like
-            lines = [ln.strip() for ln in text.splitlines() if ln.strip() and not ln.endswith(":")]
-            for ln in lines:
-                lvec = self.index.encode_query(ln)
-                score = self.index.cosine(qvec, lvec)
-                if score > best_score:
-                    best_score, best_line = score, ln
+    def run(self, query: Union[str, QueryContext], hits: Optional[List[Tuple[str, float]]] = None) -> AgentResult:
+        ctx = QueryContext.of(query)
+        if hits is None:
+            hits = self.index.search(ctx, topk=3)
+        qvec = self.index.encode_query(ctx)
+        doc_ids = [doc_id for doc_id, _ in hits]
+        dense_hits = self.dense.search(ctx.text, self.fusion_depth) if self.dense is not None else []
+        if dense_hits:
+            lexical = [key for key, _ in self.index.rank_lines(qvec, doc_ids, self.fusion_depth)]
+            doc_id, n = reciprocal_rank_fusion([lexical, [key for key, _ in dense_hits]])[0]
+            best_line = self.index.doc_lines[doc_id][n]
+        else:
+            best_line, _ = self.index.best_line(qvec, doc_ids)
         if not best_line:
-            best_line = "Sorry, I couldn't find a direct answer."
+            best_line = NO_ANSWER
         return AgentResult(answer=best_line, agent_name=self.name)
 
 class SalaryAgent(BaseAgent): pass
 class InsuranceAgent(BaseAgent): pass
 
+class KeywordRouter:
+    """Keyword matcher compiled from the agents' keyword lists.
+
+    Keywords are tokenized like queries and looked up as token n-grams of the query,
+    so matching costs O(query tokens x longest keyword) dict probes.
+    """
+    def __init__(self, agents: Sequence[BaseAgent]):
+        self.phrases: Dict[Tuple[str, ...], List[int]] = {}
+        for i, agent in enumerate(agents):
+            for kw in agent.keywords:
+                owners = self.phrases.setdefault(tuple(tokenize(kw)), [])
+                if i not in owners:
+                    owners.append(i)
+        self.phrases.pop((), None)
+        self.max_len = max(map(len, self.phrases), default=0)
+
+    def match(self, tokens: Sequence[str]) -> Optional[int]:
+        """The agent with strictly the most keyword hits, or None when tied or unmatched."""
+        counts: Dict[int, int] = {}
+        for n in range(1, self.max_len + 1):
+            for j in range(len(tokens) - n + 1):
+                for i in self.phrases.get(tuple(tokens[j:j + n]), ()):
+                    counts[i] = counts.get(i, 0) + 1
+        if not counts:
+            return None
+        top = sorted(counts.values(), reverse=True)
+        if len(top) > 1 and top[0] == top[1]:
+            return None
+        return max(counts, key=counts.get)
+
+@dataclass
+class RouteStats:
+    fast: int = 0
+    full: int = 0
+    fast_seconds: float = 0.0
+    full_seconds: float = 0.0
+
+    @property
+    def saved_seconds(self) -> float:
+        """Estimated time saved: each fast-path route priced at the mean full-route cost."""
+        if not self.full:
+            return 0.0
+        return self.fast * self.full_seconds / self.full - self.fast_seconds
+
+class QueryCache:
+    """Thread-safe LRU of routing results, bounded by size and age.
+
+    Entries carry the stamp (index versions) they were computed under; a lookup with
+    a different stamp drops the whole cache, so results never outlive an index change.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 3600.0):
+        self.maxsize, self.ttl = maxsize, ttl
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+        self._data: "OrderedDict[Tuple[str, ...], Tuple[float, AgentResult]]" = OrderedDict()
+        self._stamp: Optional[Tuple] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_data"], state["_lock"] = OrderedDict(), None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _check(self, stamp: Tuple):
+        if stamp != self._stamp:
+            if self._data:
+                self.invalidations += 1
+                self._data.clear()
+            self._stamp = stamp
+
+    def get(self, key: Tuple[str, ...], stamp: Tuple) -> Optional[AgentResult]:
+        with self._lock:
+            self._check(stamp)
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple[str, ...], value: AgentResult, stamp: Tuple):
+        if self.maxsize <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else math.inf
+        with self._lock:
+            self._check(stamp)
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def info(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "expirations": self.expirations, "invalidations": self.invalidations,
+                "size": len(self._data), "maxsize": self.maxsize}
+
 class Coordinator:
-    def __init__(self, salary_agent: SalaryAgent, insurance_agent: InsuranceAgent):
-        self.salary = salary_agent
-        self.insurance = insurance_agent
-    
-    def route(self, query: str) -> AgentResult:
-        s_hits = self.salary.index.search(query, topk=3)
-        i_hits = self.insurance.index.search(query, topk=3)
-        s_score = sum(s for _, s in s_hits) / max(1, len(s_hits))
-        i_score = sum(s for _, s in i_hits) / max(1, len(i_hits))
-        if i_score > s_score:
-            return self.insurance.run(query)
-        return self.salary.run(query)
-
-def build_system(salary_docs: List[Document], insurance_docs: List[Document]) -> Coordinator:
-    s_idx = MiniTfidf(salary_docs)
-    i_idx = MiniTfidf(insurance_docs)
-    s_agent = SalaryAgent("Salary Agent", s_idx, ["salary","payslip","ctc","hra","deduction","net","gross","basic"])
-    i_agent = InsuranceAgent("Insurance Agent", i_idx, ["insurance","policy","premium","claim","coverage","exclusion","document"])
+    """Routes each question to the registered agent whose index matches it best.
+
+    A question whose keywords point at exactly one agent (see ``KeywordRouter``) goes
+    straight to it; otherwise only candidate agents are searched. Candidates come from
+    a term -> agents table, rebuilt lazily when an index changes, and only the
+    question's selective terms count: those found in at most ``candidate_share`` of the
+    agents (an agent-level IDF cut-off). Words every agent has ("what", "is", "my")
+    therefore add no candidates, and routing cost follows the agents a question is
+    actually about rather than the number registered. A question with no selective
+    term falls back to every agent sharing any of its terms. With ``max_workers`` > 1
+    candidate searches run on a thread pool; that only helps indexes whose scoring
+    releases the GIL (``SparseTfidf``), not pure-Python ``MiniTfidf``. Ties, including
+    "nothing matched", go to the earliest registered agent. ``stats`` counts fast-path
+    and full routes of ``route``.
+
+    Results are cached per token sequence (``cache``, see ``QueryCache``); a
+    ``cache_size`` of 0 disables it.
+    """
+    def __init__(self, *agents: BaseAgent, max_workers: int = 0, use_keywords: bool = True,
+                 cache_size: int = 1024, cache_ttl: Optional[float] = 3600.0, candidate_share: float = 0.5):
+        self.agents: List[BaseAgent] = []
+        self.max_workers = max_workers
+        self.candidate_share = candidate_share
+        self.use_keywords = use_keywords
+        self.stats = RouteStats()
+        self.cache = QueryCache(cache_size, cache_ttl)
+        self._keywords: Optional[KeywordRouter] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._term_agents: Dict[str, List[int]] = {}
+        self._versions: Tuple[Tuple[int, int], ...] = ()
+        for agent in agents:
+            self.register(agent)
+
+    def register(self, agent: BaseAgent):
+        self.agents.append(agent)
+        self._versions = ()
+        self._keywords = None
+
+    def _keyword_match(self, ctx: QueryContext) -> Optional[int]:
+        if not self.use_keywords:
+            return None
+        if self._keywords is None:
+            self._keywords = KeywordRouter(self.agents)
+        return self._keywords.match(ctx.tokens)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+
+    def _stamp(self) -> Tuple[Tuple[int, int], ...]:
+        return tuple((id(a.index), a.index.version) for a in self.agents)
+
+    def _table(self) -> Dict[str, List[int]]:
+        versions = self._stamp()
+        if versions != self._versions:
+            table: Dict[str, List[int]] = {}
+            for i, agent in enumerate(self.agents):
+                for t in agent.index.postings:
+                    table.setdefault(t, []).append(i)
+            self._term_agents, self._versions = table, versions
+        return self._term_agents
+
+    def _candidates(self, ctx: QueryContext) -> List[int]:
+        table = self._table()
+        lists = [table[t] for t in ctx.tf if t in table]
+        limit = max(1, self.candidate_share * len(self.agents))
+        selective = {i for agents in lists if len(agents) <= limit for i in agents}
+        return sorted(selective or {i for agents in lists for i in agents})
+
+    def _map(self, fn, items: List) -> List:
+        if self.max_workers > 1 and len(items) > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers)
+            return list(self._pool.map(fn, items))
+        return [fn(item) for item in items]
+
+    def route(self, query: Union[str, QueryContext]) -> AgentResult:
+        ctx = QueryContext.of(query)
+        key, stamp = tuple(ctx.tokens), self._stamp()
+        cached = self.cache.get(key, stamp)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        i = self._keyword_match(ctx)
+        if i is not None:
+            result = self.agents[i].run(ctx)
+            self.stats.fast += 1
+            self.stats.fast_seconds += time.perf_counter() - start
+        else:
+            idxs = self._candidates(ctx)
+            hits = self._map(lambda i: self.agents[i].index.search(ctx, topk=3), idxs)
+            result = self._pick(ctx, dict(zip(idxs, hits)))
+            self.stats.full += 1
+            self.stats.full_seconds += time.perf_counter() - start
+        self.cache.put(key, result, stamp)
+        return result
+
+    def route_batch(self, queries: Sequence[Union[str, QueryContext]], processes: int = 0,
+                    chunk_size: int = 256) -> List[AgentResult]:
+        """Route many questions at once; each index scores its share of the batch in one call.
+
+        With ``processes`` > 1, batches longer than ``chunk_size`` are split across a
+        process pool whose workers receive the coordinator once, at start-up.
+        """
+        # dense encoders are not picklable, so agents with one always route in-process
+        if processes > 1 and len(queries) > chunk_size and all(getattr(a, "dense", None) is None for a in self.agents):
+            chunks = [list(queries[i:i + chunk_size]) for i in range(0, len(queries), chunk_size)]
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self,)) as pool:
+                return [r for part in pool.map(_route_chunk, chunks) for r in part]
+        ctxs = [QueryContext.of(q) for q in queries]
+        direct = {j: i for j, i in ((j, self._keyword_match(ctx)) for j, ctx in enumerate(ctxs)) if i is not None}
+        wanted: Dict[int, List[int]] = {}
+        for j, ctx in enumerate(ctxs):
+            if j in direct:
+                continue
+            for i in self._candidates(ctx):
+                wanted.setdefault(i, []).append(j)
+        agent_ids = list(wanted)
+        batches = self._map(lambda i: self.agents[i].index.search_batch([ctxs[j] for j in wanted[i]], topk=3), agent_ids)
+        per_query: List[Dict[int, List[Tuple[str, float]]]] = [{} for _ in ctxs]
+        for i, batch in zip(agent_ids, batches):
+            for j, hits in zip(wanted[i], batch):
+                per_query[j][i] = hits
+        return [self.agents[direct[j]].run(ctx) if j in direct else self._pick(ctx, hits)
+                for j, (ctx, hits) in enumerate(zip(ctxs, per_query))]
+
+    def _pick(self, ctx: QueryContext, hits_by_agent: Dict[int, List[Tuple[str, float]]]) -> AgentResult:
+        if not self.agents:
+            raise ValueError("Coordinator has no agents")
+        best, best_score = 0, 0.0
+        for i in sorted(hits_by_agent):
+            hits = hits_by_agent[i]
+            score = sum(s for _, s in hits) / max(1, len(hits))
+            if score > best_score:
+                best, best_score = i, score
+        return self.agents[best].run(ctx, hits_by_agent.get(best))
+
+_WORKER_COORDINATOR: Optional[Coordinator] = None
+
+def _init_worker(coordinator: Coordinator):
+    global _WORKER_COORDINATOR
+    _WORKER_COORDINATOR = coordinator
+
+def _route_chunk(queries: List[Union[str, QueryContext]]) -> List[AgentResult]:
+    return _WORKER_COORDINATOR.route_batch(queries)
+
+def build_system(salary_docs: List[Document], insurance_docs: List[Document],
+                 index_cls: type = MiniTfidf, encoder=None, dense_options: Optional[dict] = None,
+                 **index_options) -> Coordinator:
+    """Salary and insurance agents behind a Coordinator.
+
+    ``encoder`` (e.g. ``dense.load_encoder()``) gives each agent a DenseRetriever built
+    with ``dense_options``; without one the agents are purely lexical.
+    """
+    s_idx = index_cls(salary_docs, **index_options)
+    i_idx = index_cls(insurance_docs, **index_options)
+    s_dense = i_dense = None
+    if encoder is not None:
+        s_dense = DenseRetriever(s_idx, encoder, **(dense_options or {}))
+        i_dense = DenseRetriever(i_idx, encoder, **(dense_options or {}))
+    s_agent = SalaryAgent("Salary Agent", s_idx, ["salary","payslip","ctc","hra","deduction","net","gross","basic"], s_dense)
+    i_agent = InsuranceAgent("Insurance Agent", i_idx, ["insurance","policy","premium","claim","coverage","exclusion","document"], i_dense)
     return Coordinator(s_agent, i_agent)
@@ -1,10 +1,12 @@
 
 import streamlit as st
 from pathlib import Path
-from agents import Document, build_system
-from gtts import gTTS
-import base64
+from agents import NO_ANSWER, Document, build_system
+from tts import AudioCache, Speaker
+import hashlib
 import os
+import threading
+import time
 
 # ---- Page Config ----
 st.set_page_config(
@@ -36,6 +38,10 @@ with st.sidebar:
 # ---- Load docs & coordinator ----
 BASE_DIR = Path(__file__).resolve().parent
 data_dir = BASE_DIR / "data"
+DATA_FILES = {
+    "salary": (data_dir / "salary.txt", "Salary info unavailable."),
+    "insurance": (data_dir / "insurance.txt", "Insurance info unavailable."),
+}
 
 def safe_read(path: Path, default: str) -> str:
     """Read file safely, return default text if missing."""
@@ -44,10 +50,87 @@ def safe_read(path: Path, default: str) -> str:
     except FileNotFoundError:
         return default
 
-salary_docs = [Document("salary", safe_read(data_dir / "salary.txt", "Salary info unavailable."))]
-insurance_docs = [Document("insurance", safe_read(data_dir / "insurance.txt", "Insurance info unavailable."))]
-
-coordinator = build_system(salary_docs, insurance_docs)
+def data_stamp() -> tuple:
+    """(mtime_ns, size) of every data file; cheap enough to poll."""
+    stamp = []
+    for path, _ in DATA_FILES.values():
+        try:
+            info = path.stat()
+            stamp.append((info.st_mtime_ns, info.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+def read_data() -> dict:
+    """The text of every data file, by name."""
+    return {name: safe_read(path, default) for name, (path, default) in DATA_FILES.items()}
+
+def data_digest(texts: dict) -> str:
+    return hashlib.sha256("\0".join(texts.values()).encode("utf-8")).hexdigest()
+
+def load_coordinator(texts=None):
+    """Build the coordinator from data/*.txt (or ``texts``); returns it with a hash of the text it was built from."""
+    texts = read_data() if texts is None else texts
+    coordinator = build_system([Document("salary", texts["salary"])], [Document("insurance", texts["insurance"])])
+    return coordinator, data_digest(texts)
+
+class LiveCoordinator:
+    """The current coordinator, rebuilt by a watcher thread when the data files change.
+
+    A rebuild happens off the request path and is published with a single attribute
+    assignment, so questions already holding the old coordinator finish on it. Files that
+    are touched without their content changing (same hash) keep the current one.
+    """
+    def __init__(self, interval: float = 2.0, on_build=None):
+        self.interval = interval
+        self.on_build = on_build
+        self._stamp = data_stamp()
+        self.coordinator, self.digest = load_coordinator()
+        if on_build is not None:
+            on_build(self.coordinator)
+        self._lock = threading.Lock()
+        threading.Thread(target=self._watch, name="data-watcher", daemon=True).start()
+
+    def refresh(self) -> bool:
+        with self._lock:
+            stamp = data_stamp()
+            if stamp == self._stamp:
+                return False
+            # hash before building: a touch or a save without edits costs a read, not a rebuild
+            texts = read_data()
+            self._stamp = stamp
+            if data_digest(texts) == self.digest:
+                return False
+            coordinator, digest = load_coordinator(texts)
+            self.coordinator, self.digest = coordinator, digest
+            if self.on_build is not None:
+                self.on_build(coordinator)
+            return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception:
+                pass  # keep serving the last good coordinator
+
+def answer_lines(coordinator) -> list:
+    """Every line an agent can answer with."""
+    lines = [ln for agent in coordinator.agents for doc in agent.index.doc_lines.values() for ln in doc]
+    return lines + [NO_ANSWER]
+
+@st.cache_resource
+def speaker() -> Speaker:
+    return Speaker(cache=AudioCache(BASE_DIR / ".tts_cache"))
+
+@st.cache_resource
+def live_coordinator() -> LiveCoordinator:
+    # one per process, shared by every session and rerun; audio for every possible
+    # answer is synthesized in the background whenever the indexes are (re)built
+    return LiveCoordinator(on_build=lambda c: speaker().precompute(answer_lines(c)))
+
+live = live_coordinator()
 
 # ---- Session state ----
 if "messages" not in st.session_state:
@@ -78,22 +161,19 @@ if prompt:
         st.markdown(prompt)
 
     # Route query
-    result = coordinator.route(prompt)
+    result = live.coordinator.route(prompt)
     answer = result.answer
 
     # Show assistant reply
     with st.chat_message("assistant", avatar=("💼" if result.agent_name == "Salary Agent" else "🛡️")):
         st.markdown(f"**{result.agent_name} (HR Buddy 🤖):**\n\n{answer}")
 
-        # Voice output
+        # Voice output (usually precomputed; otherwise synthesized off the request path)
         try:
-            tts = gTTS(answer)
-            tts.save("reply.mp3")
-            audio_file = open("reply.mp3", "rb").read()
-            audio_b64 = base64.b64encode(audio_file).decode()
-            st.audio(f"data:audio/mp3;base64,{audio_b64}", format="audio/mp3")
+            audio = speaker().submit(answer).result(timeout=15)
+            st.audio(audio, format=speaker().mime)
         except Exception:
-            st.warning("Voice assistant unavailable (gTTS error).")
+            st.warning("Voice assistant unavailable (TTS error).")
 
     # Save assistant reply
     st.session_state.messages.append(("assistant", f"{answer}", result.agent_name))
@@ -0,0 +1,261 @@
+# bench.py
+"""Micro-benchmarks for agents.py. Run: python bench.py [name ...]"""
+from __future__ import annotations
+import random, sys, time, tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import agents
+from agents import NO_ANSWER, AgentResult, BaseAgent, Coordinator, Document, MiniTfidf, build_system, candidate_lines
+
+DATA = Path(__file__).resolve().parent / "data"
+QUERIES = [
+    "How do I calculate annual salary?",
+    "What is included in my CTC?",
+    "How can I claim insurance?",
+    "What documents are needed to claim insurance?",
+    "What is the take-home salary after deductions?",
+    "Is dental treatment covered by the policy?",
+]
+
+def synthetic_docs(n: int, seed: int = 0, prefix: str = "doc") -> List[Document]:
+    """``n`` documents made of random lines from ``data/*.txt``."""
+    lines = [ln for p in sorted(DATA.glob("*.txt")) for ln in p.read_text(encoding="utf-8").splitlines() if ln.strip()]
+    rnd = random.Random(seed)
+    return [Document(f"{prefix}{i}", "\n".join(rnd.choices(lines, k=12))) for i in range(n)]
+
+def _allocations(fn: Callable[[str], object], queries: List[str]) -> float:
+    """Memory blocks allocated per query by agents.py and bench.py code, short-lived ones included.
+
+    Every value a Python function returns is kept alive until the pass ends, so a
+    tracemalloc snapshot diff also counts the intermediates a query creates and drops
+    (token lists, term counts, query vectors...).
+    """
+    kept = []
+    def keep(frame, event, arg):
+        if event == "return":
+            kept.append(arg)
+    filters = [tracemalloc.Filter(True, agents.__file__), tracemalloc.Filter(True, __file__),
+               tracemalloc.Filter(False, __file__, keep.__code__.co_firstlineno + 2)]  # kept's own growth
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot().filter_traces(filters)
+    sys.setprofile(keep)
+    try:
+        for q in queries:
+            fn(q)
+    finally:
+        sys.setprofile(None)
+    after = tracemalloc.take_snapshot().filter_traces(filters)
+    tracemalloc.stop()
+    return sum(s.count_diff for s in after.compare_to(before, "lineno") if s.count_diff > 0) / len(queries)
+
+def _timed(fn: Callable[[str], object], queries: List[str], rounds: int = 200) -> Dict[str, float]:
+    """Latency, tokenize calls, allocated blocks and peak memory per query.
+
+    The memoised query tokens are cleared before every measured pass, so each pass pays
+    for tokenizing its questions once, like a fresh request would.
+    """
+    calls = 0
+    tokenize = agents.tokenize
+    def counting(text):
+        nonlocal calls
+        calls += 1
+        return tokenize(text)
+    for q in queries:  # warm-up: lazily built tables should not count against the measured pass
+        fn(q)
+    agents.tokenize = counting
+    try:
+        agents._query_tokens.cache_clear()
+        tracemalloc.start()
+        for q in queries:
+            fn(q)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        calls_per_query = calls / len(queries)
+        agents._query_tokens.cache_clear()
+        blocks = _allocations(fn, queries)
+        elapsed = 0.0
+        for _ in range(rounds):
+            agents._query_tokens.cache_clear()
+            start = time.perf_counter()
+            for q in queries:
+                fn(q)
+            elapsed += time.perf_counter() - start
+    finally:
+        agents.tokenize = tokenize
+    return {"us/query": elapsed / (rounds * len(queries)) * 1e6,
+            "tokenize/query": calls_per_query, "alloc blocks/query": blocks, "peak KiB": peak / 1024}
+
+def _report(title: str, rows: Dict[str, Dict[str, float]]):
+    print(title)
+    for name, row in rows.items():
+        print(f"  {name:<28}" + "  ".join(f"{k}={v:,.1f}" for k, v in row.items()))
+
+def bench_tokenizer():
+    """tokenize vs. the original per-token .lower() on a multi-megabyte corpus, then index builds."""
+    docs = synthetic_docs(20000, 3)
+    text = "\n".join(d.text for d in docs)
+
+    def legacy(t: str) -> List[str]:
+        return [w.lower() for w in agents.WORD.findall(t)]
+
+    print(f"tokenizer ({len(text) / 1e6:.1f} MB)")
+    for name, fn in (("regex + per-token lower", legacy), ("tokenize", agents.tokenize)):
+        start = time.perf_counter()
+        n = len(fn(text))
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<28}{elapsed * 1e3:,.1f} ms  {len(text) / elapsed / 1e6:,.1f} MB/s  {n:,} tokens")
+    for scoring in MiniTfidf.SCORINGS:
+        start = time.perf_counter()
+        index = MiniTfidf(docs, scoring=scoring)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        for q in QUERIES * 20:
+            index.search(q)
+        per_query = (time.perf_counter() - start) / (len(QUERIES) * 20)
+        print(f"  build/search {scoring:<15}{built * 1e3:,.1f} ms build  {per_query * 1e6:,.1f} us/query")
+
+def _scan_search(index: MiniTfidf, q: str, topk: int = 3):
+    # the original search: encode the raw string, then a cosine against every document
+    qvec = index.encode_query(q)
+    scores = [(doc_id, index.cosine(qvec, dvec)) for doc_id, dvec in index.doc_vectors.items()]
+    scores.sort(key=lambda x: x[1], reverse=True)
+    return scores[:topk]
+
+def bench_query_context():
+    """Coordinator.route with a shared QueryContext vs. re-encoding the string per call,
+    and vs. the original flow (full scans, every answer line re-encoded)."""
+    coord = build_system(synthetic_docs(500, 1, "s"), synthetic_docs(500, 2, "i"))
+    coord.cache.maxsize = 0  # measure scoring, not the result cache
+
+    def original(q: str):
+        salary, insurance = coord.agents
+        s_hits = _scan_search(salary.index, q)
+        i_hits = _scan_search(insurance.index, q)
+        s_score = sum(s for _, s in s_hits) / max(1, len(s_hits))
+        i_score = sum(s for _, s in i_hits) / max(1, len(i_hits))
+        agent = insurance if i_score > s_score else salary
+        index = agent.index
+        qvec = index.encode_query(q)
+        best_line, best_score = "", 0.0
+        for doc_id, _ in _scan_search(index, q):
+            for ln in candidate_lines(index.doc_map[doc_id].text):
+                score = index.cosine(qvec, index.encode_query(ln))
+                if score > best_score:
+                    best_score, best_line = score, ln
+        return AgentResult(answer=best_line or NO_ANSWER, agent_name=agent.name)
+
+    def per_call(q: str):
+        # the old flow: every search/run call tokenizes and encodes the raw string again
+        salary, insurance = coord.agents
+        s_hits = salary.index.search(q)
+        i_hits = insurance.index.search(q)
+        s_score = sum(s for _, s in s_hits) / max(1, len(s_hits))
+        i_score = sum(s for _, s in i_hits) / max(1, len(i_hits))
+        agent = insurance if i_score > s_score else salary
+        hits = agent.index.search(q)
+        agent.index.encode_query(q)
+        return agent.run(q, hits)
+
+    _report("query context (1000 docs, 2 agents)", {"original scan": _timed(original, QUERIES, rounds=20),
+                                                    "per-call encoding": _timed(per_call, QUERIES),
+                                                    "shared QueryContext": _timed(coord.route, QUERIES)})
+
+def _word(rnd: random.Random) -> str:
+    return "".join(rnd.choices("abcdefghijklmnopqrstuvwxyz", k=rnd.randint(5, 9)))
+
+def domain_agents(n_agents: int, docs_per_agent: int = 200, seed: int = 0):
+    """Agents with mostly private vocabularies plus a few words shared by all of them."""
+    rnd = random.Random(seed)
+    shared = [_word(rnd) for _ in range(10)]
+    agents_, vocabs = [], []
+    for a in range(n_agents):
+        vocab = [_word(rnd) for _ in range(300)]
+        docs = [Document(f"a{a}d{i}", "\n".join(" ".join(rnd.choices(vocab, k=8) + rnd.choices(shared, k=1))
+                                                for _ in range(6)))
+                for i in range(docs_per_agent)]
+        agents_.append(BaseAgent(f"Agent {a}", MiniTfidf(docs), []))
+        vocabs.append(vocab)
+    return agents_, vocabs, shared
+
+def bench_routing():
+    """Routing latency for 2, 10 and 50 agents: term -> agent table vs. searching every agent."""
+    for n in (2, 10, 50):
+        agents_, vocabs, shared = domain_agents(n)
+        rnd = random.Random(n)
+        domain_qs = [" ".join(rnd.choices(vocabs[rnd.randrange(n)], k=4)) for _ in range(50)]
+        shared_qs = [q + " " + rnd.choice(shared) for q in domain_qs]
+        coord = Coordinator(*agents_, cache_size=0)
+
+        def every_agent(q: str):
+            scores = []
+            for agent in coord.agents:
+                hits = agent.index.search(q)
+                scores.append(sum(s for _, s in hits) / max(1, len(hits)))
+            best = max(range(len(scores)), key=lambda i: (scores[i], -i))
+            return coord.agents[best].run(q)
+
+        _report(f"routing ({n} agents x 200 docs)", {
+            "search every agent": _timed(every_agent, domain_qs, rounds=20),
+            "candidate agents": _timed(coord.route, domain_qs, rounds=20),
+            "every agent, shared word": _timed(every_agent, shared_qs, rounds=20),
+            "candidates, shared word": _timed(coord.route, shared_qs, rounds=20),
+        })
+
+def bench_keywords():
+    """Keyword pre-router on/off for 10 agents whose keywords are 20 of their own words."""
+    agents_, vocabs, shared = domain_agents(10)
+    for agent, vocab in zip(agents_, vocabs):
+        agent.keywords = vocab[:20]
+    rnd = random.Random(1)
+    queries = [" ".join(rnd.choices(vocabs[rnd.randrange(10)], k=3) + [rnd.choice(shared)]) for _ in range(50)]
+    with_kw, without_kw = Coordinator(*agents_, cache_size=0), Coordinator(*agents_, use_keywords=False, cache_size=0)
+    _report("keyword pre-router (10 agents x 200 docs)", {"full scoring": _timed(without_kw.route, queries, rounds=20),
+                                                         "keywords first": _timed(with_kw.route, queries, rounds=20)})
+    st = with_kw.stats
+    print(f"  fast path {st.fast}/{st.fast + st.full} routes, ~{st.saved_seconds * 1e3:,.1f} ms saved")
+
+def bench_cache():
+    """Sidebar questions plus near-duplicates (case/punctuation) with and without the result cache."""
+    docs = synthetic_docs(500, 1, "s"), synthetic_docs(500, 2, "i")
+    uncached, cached = build_system(*docs), build_system(*docs)
+    uncached.cache.maxsize = 0
+    queries = QUERIES + [q.upper() for q in QUERIES] + [q.rstrip("?") + "!!" for q in QUERIES]
+    _report("route result cache (1000 docs, 2 agents)", {"no cache": _timed(uncached.route, queries),
+                                                        "LRU cache": _timed(cached.route, queries)})
+    print("  " + ", ".join(f"{k}={v}" for k, v in cached.cache.info().items()))
+
+def hashed_encoder(dim: int = 384):
+    """Stand-in for a sentence-transformer: hashed bag of words (bench only, no model download)."""
+    import numpy as np
+    def encode(texts: List[str]):
+        out = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for t in agents.tokenize(text):
+                out[i, hash(t) % dim] += 1.0
+        return out
+    return encode
+
+def bench_dense():
+    """Lexical-only agents vs. lexical + dense RRF (float32 and float16 line matrices)."""
+    from dense import load_encoder
+    encoder = load_encoder() or hashed_encoder()
+    docs = synthetic_docs(500, 1, "s"), synthetic_docs(500, 2, "i")
+    lexical = build_system(*docs)
+    lexical.cache.maxsize = 0
+    rows = {"lexical only": _timed(lexical.route, QUERIES, rounds=20)}
+    for dtype in ("float32", "float16"):
+        coord = build_system(*docs, encoder=encoder, dense_options={"dtype": dtype, "latency_budget": 1.0})
+        coord.cache.maxsize = 0
+        rows[f"hybrid {dtype}"] = _timed(coord.route, QUERIES, rounds=20)
+        dense = coord.agents[0].dense
+        rows[f"hybrid {dtype}"]["dense p95 ms"] = dense.p95() * 1e3
+        rows[f"hybrid {dtype}"]["matrix KiB"] = dense.matrix.nbytes / 1024
+    _report(f"hybrid retrieval (1000 docs, {len(coord.agents[0].dense.keys):,} lines/agent)", rows)
+
+BENCHES = {"tokenizer": bench_tokenizer, "context": bench_query_context, "routing": bench_routing, "keywords": bench_keywords,
+           "cache": bench_cache, "dense": bench_dense}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(BENCHES):
+        BENCHES[name]()
@@ -0,0 +1,140 @@
+# dense.py
+"""Optional dense line retriever that agents fuse with their lexical index (see BaseAgent)."""
+from __future__ import annotations
+import math, time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:  # optional: approximate search for large line sets
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+Encoder = Callable[[List[str]], "np.ndarray"]
+LineKey = Tuple[str, int]
+
+def load_encoder(model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> Optional[Encoder]:
+    """A local sentence-transformers model as an encoder, or None if it cannot be loaded."""
+    if np is None:
+        return None
+    try:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name)
+    except Exception:  # package missing, weights not downloaded, no network...
+        return None
+    return lambda texts: model.encode(texts, batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+
+class DenseRetriever:
+    """Cosine search over every candidate line of a MiniTfidf index.
+
+    Each line is embedded once (vectors are kept per line text, so index updates only
+    embed new lines) into a normalised ``dtype`` matrix, searched by brute force, or with
+    hnswlib once there are ``hnsw_min_lines`` lines and it is installed. Without an
+    encoder ``search`` returns nothing and agents answer lexically. The same happens while
+    the p95 of the last ``window`` dense searches exceeds ``latency_budget`` seconds; one
+    search in every ``reprobe_every`` still runs so the estimate can recover. Lines less
+    similar than ``min_similarity`` are not returned, so a query unrelated to every line
+    gets no dense hits (and the agent can still say it found nothing).
+    """
+
+    def __init__(self, index, encoder: Optional[Encoder] = None, dtype: str = "float32",
+                 latency_budget: float = 0.05, window: int = 200, reprobe_every: int = 50,
+                 hnsw_min_lines: int = 20000, min_similarity: float = 0.3):
+        self.index = index
+        self.encoder = encoder
+        self.dtype = dtype
+        self.latency_budget = latency_budget
+        self.reprobe_every = reprobe_every
+        self.hnsw_min_lines = hnsw_min_lines
+        self.min_similarity = min_similarity
+        self.keys: List[LineKey] = []
+        self.matrix = None
+        self.latencies: deque = deque(maxlen=window)
+        self.skipped = 0
+        self._vectors: Dict[str, "np.ndarray"] = {}
+        self._hnsw = None
+        self._version = -1
+        if self.encoder is not None:
+            self._embed_lines()
+
+    @property
+    def loaded(self) -> bool:
+        return self.encoder is not None and np is not None
+
+    def p95(self) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def _encode(self, texts: List[str]) -> "np.ndarray":
+        vecs = np.asarray(self.encoder(texts), dtype=np.float32)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        return vecs / np.where(norms > 0, norms, 1.0)
+
+    def _embed_lines(self):
+        lines = self.index.doc_lines
+        self.keys = [(doc_id, n) for doc_id, ls in lines.items() for n in range(len(ls))]
+        texts = [lines[doc_id][n] for doc_id, n in self.keys]
+        new = list(dict.fromkeys(t for t in texts if t not in self._vectors))
+        if new:
+            self._vectors.update(zip(new, self._encode(new)))
+        live = set(texts)
+        for t in [t for t in self._vectors if t not in live]:
+            del self._vectors[t]
+        if texts:
+            self.matrix = np.stack([self._vectors[t] for t in texts]).astype(self.dtype)
+        else:
+            self.matrix = None
+        self._hnsw = None
+        if hnswlib is not None and len(texts) >= self.hnsw_min_lines:
+            self._hnsw = hnswlib.Index(space="ip", dim=self.matrix.shape[1])
+            self._hnsw.init_index(max_elements=len(texts), ef_construction=200, M=16)
+            self._hnsw.add_items(self.matrix.astype(np.float32), np.arange(len(texts)))
+        self._version = self.index.version
+
+    def _scores(self, q: "np.ndarray") -> "np.ndarray":
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ q
+        # NumPy has no BLAS path for float16; einsum accumulates in float32 without
+        # materialising an up-cast copy, but is still several times slower than float32
+        return np.einsum("ij,j->i", self.matrix, q, dtype=np.float32)
+
+    def search(self, text: str, k: int = 10) -> List[Tuple[LineKey, float]]:
+        """Top ``k`` lines by cosine similarity, at least ``min_similarity``; [] when dense search is unavailable."""
+        if not self.loaded:
+            return []
+        if len(self.latencies) >= 20 and self.p95() > self.latency_budget:
+            self.skipped += 1
+            if self.skipped % self.reprobe_every:
+                return []
+        start = time.perf_counter()
+        if self._version != self.index.version:
+            self._embed_lines()
+        if self.matrix is None:
+            return []
+        q = self._encode([text])[0]
+        k = min(k, len(self.keys))
+        if self._hnsw is not None:
+            self._hnsw.set_ef(max(50, k))
+            labels, dists = self._hnsw.knn_query(q, k=k)
+            hits = [(self.keys[i], 1.0 - float(d)) for i, d in zip(labels[0], dists[0])]
+        else:
+            scores = self._scores(q)
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+            top = top[np.lexsort((top, -scores[top]))]
+            hits = [(self.keys[i], float(scores[i])) for i in top]
+        self.latencies.append(time.perf_counter() - start)
+        return [(key, score) for key, score in hits if score >= self.min_similarity]
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[LineKey]], k: int = 60) -> List[LineKey]:
+    """Keys ordered by sum of 1 / (k + rank) over ``rankings``; ties keep first-seen order."""
+    fused: Dict[LineKey, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=fused.__getitem__, reverse=True)
@@ -0,0 +1,174 @@
+# tts.py
+"""Text-to-speech for HR Buddy: pluggable backends behind a content-addressed disk cache."""
+from __future__ import annotations
+import hashlib, io, math, os, struct, threading, wave
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+class GTTSBackend:
+    """Google TTS (needs the ``gTTS`` package and network access); MP3 bytes."""
+    mime = "audio/mp3"
+
+    def __init__(self, lang: str = "en"):
+        from gtts import gTTS  # imported here so the offline backend works without it
+        self._gtts = gTTS
+        self.lang = lang
+        self.voice = f"gtts:{lang}"
+
+    def synthesize(self, text: str) -> bytes:
+        buf = io.BytesIO()
+        self._gtts(text, lang=self.lang).write_to_fp(buf)
+        return buf.getvalue()
+
+class ToneBackend:
+    """Offline stand-in: one short beep per word as 16-bit mono WAV (stdlib only)."""
+    mime = "audio/wav"
+    voice = "tone"
+
+    def __init__(self, rate: int = 8000, freq: float = 440.0, beep: float = 0.08, gap: float = 0.04):
+        self.rate, self.freq, self.beep, self.gap = rate, freq, beep, gap
+
+    def synthesize(self, text: str) -> bytes:
+        n_beep, n_gap = int(self.rate * self.beep), int(self.rate * self.gap)
+        tone = b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * self.freq * i / self.rate)))
+                        for i in range(n_beep))
+        frames = (tone + b"\0\0" * n_gap) * max(1, len(text.split()))
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.rate)
+            w.writeframes(frames)
+        return buf.getvalue()
+
+def default_backend():
+    """gTTS when installed (unless ``HR_BUDDY_TTS=tone``), else the offline tone backend."""
+    if os.environ.get("HR_BUDDY_TTS", "").lower() != "tone":
+        try:
+            return GTTSBackend()
+        except ImportError:
+            pass
+    return ToneBackend()
+
+class AudioCache:
+    """Audio bytes on disk under sha256(voice, text), evicted least-recently-used by total size.
+
+    Writes go through a temp file and ``os.replace`` so concurrent sessions (or
+    processes) never read a partial file; reads bump the file's mtime as the LRU clock.
+    """
+    def __init__(self, root: Path, max_bytes: int = 64 * 1024 * 1024):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self.root.glob("*.audio"))
+
+    @staticmethod
+    def key(text: str, voice: str) -> str:
+        return hashlib.sha256(f"{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.audio"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        with self._lock:
+            old = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+            self._size += len(data) - old
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        files = []
+        for p in self.root.glob("*.audio"):
+            try:
+                info = p.stat()
+            except FileNotFoundError:
+                continue
+            files.append((info.st_mtime_ns, info.st_size, p))
+        self._size = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files, key=lambda f: f[0]):
+            if self._size <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    def info(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._size, "max_bytes": self.max_bytes}
+
+class Speaker:
+    """Cached, non-blocking synthesis: ``submit`` returns a Future and never runs the backend inline.
+
+    Requests for the same text share one in-flight synthesis.
+    """
+    def __init__(self, backend=None, cache: Optional[AudioCache] = None, max_workers: int = 2):
+        self.backend = backend or default_backend()
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="tts")
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def mime(self) -> str:
+        return self.backend.mime
+
+    def cached(self, text: str) -> Optional[bytes]:
+        return self.cache.get(AudioCache.key(text, self.backend.voice)) if self.cache is not None else None
+
+    def submit(self, text: str) -> Future:
+        key = AudioCache.key(text, self.backend.voice)
+        data = self.cache.get(key) if self.cache is not None else None
+        if data is not None:
+            done: Future = Future()
+            done.set_result(data)
+            return done
+        with self._lock:
+            fut = self._pending.get(key)
+            if fut is None:
+                fut = self._pending[key] = self._pool.submit(self._synthesize, key, text)
+        return fut
+
+    def _synthesize(self, key: str, text: str) -> bytes:
+        try:
+            data = self.backend.synthesize(text)
+            if self.cache is not None:
+                self.cache.put(key, data)
+            return data
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def precompute(self, texts: Iterable[str]):
+        """Synthesize every text not cached yet (e.g. all candidate answer lines) in the background.
+
+        Texts are fed to the pool one at a time, so interactive ``submit`` calls never
+        queue behind the whole batch.
+        """
+        texts = [t for t in dict.fromkeys(texts) if t.strip()]
+        threading.Thread(target=self._precompute, args=(texts,), name="tts-precompute", daemon=True).start()
+
+    def _precompute(self, texts):
+        for text in texts:
+            try:
+                self.submit(text).result()
+            except Exception:
+                pass  # e.g. gTTS offline; the line is synthesized on demand instead